@@ -0,0 +1,373 @@
+"""
+    benchmark
+    Speed and memory benchmark of the DfInitCheck modes on synthetic data.
+    Every case runs in its own process so the peak memory (RSS) of one case does not hide the next one.
+    Results are saved as JSON; use --compare with an old file to spot regressions.
+    Example:
+        python benchmark.py --rows 10000 1000000 --output bench_new.json --compare bench_old.json
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataframecheck import CHUNK_SIZE, DfInitCheck
+
+try:
+    import resource  # Not available on Windows (peak RSS is then not reported).
+except ImportError:
+    resource = None
+
+# CONSTANTS ===============
+SHAPES = ['tall_narrow', 'short_wide', 'nan_heavy', 'duplicate_heavy', 'string_heavy']
+# Modes that load the whole file into a DataFrame first.
+MEMORY_MODES = ['check_df', 'profile', 'profile_hash', 'profile_parallel', 'remove_na', 'optimize_memory']
+# Modes that stream the file.
+STREAM_MODES = ['profile_csv', 'quick_profile']
+MODES = MEMORY_MODES + STREAM_MODES
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+# short_wide has rows / WIDE_ROWS_DIVISOR rows and WIDE_COLUMNS columns.
+WIDE_COLUMNS = 500
+WIDE_ROWS_DIVISOR = 100
+# pandas methods that read every value of the object they are called on (one scan each).
+SCAN_METHODS = ['isna', 'isnull', 'notna', 'notnull', 'count', 'sum', 'mean', 'std', 'var', 'min', 'max', 'quantile',
+                'describe', 'duplicated', 'drop_duplicates', 'nunique', 'unique', 'value_counts', 'dropna', 'fillna',
+                'astype', 'to_numpy', 'copy']
+# pandas functions that read every value of their first argument.
+SCAN_FUNCTIONS = [(pd, 'to_numeric'), (pd, 'concat'), (pd.util, 'hash_pandas_object'), (pd.util, 'hash_array')]
+WORDS = np.array(['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india',
+                  'juliett', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo'])
+
+
+def make_chunk(shape: str, rows: int, seed: int) -> pd.DataFrame:
+    """
+    Generate rows of synthetic data.
+    :param shape: One of SHAPES.
+    :param rows: Number of rows.
+    :param seed: Random seed (the same seed gives the same data).
+    :return: DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    if shape == 'short_wide':
+        return pd.DataFrame(rng.normal(size=(rows, WIDE_COLUMNS)), columns=[f'c{i}' for i in range(WIDE_COLUMNS)])
+    if shape == 'string_heavy':
+        data = {f's{i}': np.char.add(rng.choice(WORDS, rows), rng.integers(0, 10_000, rows).astype(str))
+                for i in range(5)}
+        data['value'] = rng.normal(size=rows)
+        return pd.DataFrame(data)
+    if shape == 'duplicate_heavy':
+        # Only 1000 different rows.
+        pool = make_chunk('tall_narrow', 1000, 0)
+        return pool.iloc[rng.integers(0, len(pool), rows)].reset_index(drop=True)
+
+    df = pd.DataFrame({'a': rng.normal(size=rows), 'b': rng.normal(100, 15, rows), 'c': rng.random(rows),
+                       'd': rng.exponential(size=rows), 'id': rng.integers(0, 2 ** 31, rows),
+                       'label': rng.choice(WORDS, rows)})
+    if shape == 'nan_heavy':
+        for col in ['a', 'b', 'c', 'd', 'label']:
+            df.loc[rng.random(rows) < 0.4, col] = np.nan
+    return df
+
+
+def write_dataset(shape: str, rows: int, path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """
+    Write a synthetic CSV chunk by chunk (works for files bigger than memory).
+    :param shape: One of SHAPES.
+    :param rows: Number of rows (short_wide uses rows / WIDE_ROWS_DIVISOR).
+    :param path: CSV file to create.
+    :param chunk_size: Rows generated at once.
+    :return: None.
+    """
+    if shape == 'short_wide':
+        rows = max(1, rows // WIDE_ROWS_DIVISOR)
+    for number, start in enumerate(range(0, rows, chunk_size)):
+        chunk = make_chunk(shape, min(chunk_size, rows - start), seed=number)
+        chunk.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+
+
+class CountingFile:
+    """
+        Read-only file that counts the bytes read (to measure the reads of the file).
+    """
+    def __init__(self, path: str):
+        self.__file = open(path, 'rb')
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.__file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __iter__(self):
+        for line in self.__file:
+            self.bytes_read += len(line)
+            yield line
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class ScanCounter:
+    """
+        Count the values read by pandas while it is active (to measure the passes over the data in memory).
+        SCAN_METHODS and SCAN_FUNCTIONS are wrapped: a call adds the number of values of its object. Calls made
+        inside another wrapped call (i.e. describe calling Series.mean) and by the CSV parser are not counted.
+        Scans done with NumPy directly or in other processes (the workers of profile_parallel) are not counted.
+    """
+    def __init__(self):
+        self.cells = 0
+        self.__depth = 0
+        self.__originals = []
+
+    def __enter__(self) -> 'ScanCounter':
+        for cls in (pd.DataFrame, pd.Series):
+            for name in SCAN_METHODS:
+                if hasattr(cls, name):  # i.e. unique is only a Series method.
+                    self.__wrap(cls, name, count=True)
+        for module, name in SCAN_FUNCTIONS:
+            self.__wrap(module, name, count=True)
+        # Parsing a chunk of a CSV is a read of the file (see file_reads), not a scan.
+        for name in ('read', '__next__'):
+            self.__wrap(pd.io.parsers.readers.TextFileReader, name, count=False)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for owner, name, original in reversed(self.__originals):
+            setattr(owner, name, original)
+        self.__originals = []
+
+    def __wrap(self, owner, name: str, count: bool) -> None:
+        original = getattr(owner, name)
+        counter = self
+
+        def wrapper(*args, **kwargs):
+            if count and not counter.__depth:
+                counter.cells += _values(args[0]) if args else 0
+            counter.__depth += 1
+            try:
+                return original(*args, **kwargs)
+            finally:
+                counter.__depth -= 1
+
+        self.__originals.append((owner, name, original))
+        setattr(owner, name, wrapper)
+
+
+def _values(data) -> int:
+    """
+    Number of values of a DataFrame, Series, array or list of them.
+    :param data: Object read by a scan.
+    :return: int.
+    """
+    if isinstance(data, (list, tuple)):
+        return sum(_values(item) for item in data)
+    return int(getattr(data, 'size', 0))
+
+
+def _rss_mb(field: str = 'VmHWM'):
+    """
+    Resident memory of this process in MB (None on Windows).
+    :param field: 'VmHWM' (peak) or 'VmRSS' (now). Without /proc both give the peak so far.
+    """
+    # Linux: ru_maxrss keeps the peak of the parent process after fork/exec, VmHWM does not.
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(f'{field}:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives KB, macOS gives bytes.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(mode: str, path: str, workers: int, chunk_size: int) -> dict:
+    """
+    Run one mode on one file (called in a child process).
+    :param mode: One of MODES.
+    :param path: CSV file.
+    :param workers: Processes for profile_parallel.
+    :param chunk_size: Rows per chunk for the streaming modes.
+    :return: Measures: wall time, load time, peak RSS, reads of the file and passes over the data.
+        peak_rss_mb is the memory added by the case: the RSS before it (interpreter and imports, ~110 MB with
+        pandas) is subtracted and saved as baseline_rss_mb.
+        file_reads is the bytes read / file size (1.0 = the file was read once).
+        data_passes is the values read by pandas after parsing (see ScanCounter) / values of the file: the scans
+        of the DataFrame in memory, or of the chunks for the streaming modes.
+    """
+    baseline = _rss_mb('VmRSS')
+    source = CountingFile(path)
+    start = time.perf_counter()
+    load_s = 0.0
+    data, values = source, None
+    try:
+        if mode in MEMORY_MODES:
+            data = pd.read_csv(source)
+            load_s = time.perf_counter() - start
+            values = data.size
+        with ScanCounter() as scans:
+            values = run_mode(mode, data, workers, chunk_size) or values
+    finally:
+        source.close()
+    wall_s = time.perf_counter() - start
+    return {'wall_s': round(wall_s, 4), 'load_s': round(load_s, 4), 'check_s': round(wall_s - load_s, 4),
+            'peak_rss_mb': None if baseline is None else round(_rss_mb() - baseline, 1), 'baseline_rss_mb': baseline,
+            'file_reads': round(source.bytes_read / os.path.getsize(path), 2),
+            'data_passes': round(scans.cells / values, 2) if values else None}
+
+
+def run_mode(mode: str, data, workers: int, chunk_size: int):
+    """
+    Run one mode.
+    :param mode: One of MODES.
+    :param data: DataFrame (MEMORY_MODES) or file (STREAM_MODES).
+    :param workers: Processes for profile_parallel.
+    :param chunk_size: Rows per chunk for the streaming modes.
+    :return: Values (rows x columns) of the file for the streaming modes, None for the others.
+    """
+    if mode == 'check_df':
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                DfInitCheck.check_df(data)
+            finally:
+                sys.stdout = stdout
+    elif mode == 'profile':
+        DfInitCheck.profile(data)
+    elif mode == 'profile_hash':
+        DfInitCheck.profile(data, duplicates='hash', distinct='approx')
+    elif mode == 'profile_parallel':
+        DfInitCheck.profile(data, workers=workers)
+    elif mode == 'remove_na':
+        DfInitCheck.remove_na(data)
+    elif mode == 'optimize_memory':
+        DfInitCheck.optimize_memory(data)
+    elif mode == 'profile_csv':
+        profile = DfInitCheck.profile_csv(data, chunk_size=chunk_size)
+        return profile.rows * profile.columns
+    elif mode == 'quick_profile':
+        profile = DfInitCheck.quick_profile(data, seed=0, chunk_size=chunk_size)
+        return profile.rows * profile.sample.shape[1]
+    else:
+        raise ValueError(f'Unknown mode "{mode}".')
+    return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(shapes: list, rows_list: list, modes: list, workers: int = 4, chunk_size: int = CHUNK_SIZE,
+                  max_memory_rows: int = 10_000_000, data_dir: str = None) -> dict:
+    """
+    Run every mode on every shape and size, each case in a new process.
+    :param shapes: Items of SHAPES.
+    :param rows_list: Sizes (rows) of the datasets.
+    :param modes: Items of MODES.
+    :param workers: Processes for profile_parallel.
+    :param chunk_size: Rows per chunk for the streaming modes.
+    :param max_memory_rows: Skip the in-memory modes above this size (they would not fit in RAM).
+    :param data_dir: Folder for the generated CSV files (default: temporary folder, deleted at the end).
+    :return: Dictionary with the environment and the results.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = data_dir or tmp_dir
+        for shape in shapes:
+            for rows in rows_list:
+                path = os.path.join(folder, f'{shape}_{rows}.csv')
+                if not os.path.exists(path):
+                    print(f'+-- Generating {path}...')
+                    write_dataset(shape, rows, path)
+                for mode in modes:
+                    case = {'shape': shape, 'rows': rows, 'mode': mode, 'bytes': os.path.getsize(path)}
+                    if mode in MEMORY_MODES and rows > max_memory_rows:
+                        print(f'+ {shape:<16} {rows:>11} {mode:<17} skipped (in-memory mode).')
+                        continue
+                    reply = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', mode, path,
+                                            str(workers), str(chunk_size)], capture_output=True, text=True)
+                    if reply.returncode != 0:
+                        case['error'] = reply.stderr.strip().splitlines()[-1] if reply.stderr else 'failed'
+                    else:
+                        case.update(json.loads(reply.stdout.strip().splitlines()[-1]))
+                    results.append(case)
+                    print(f'+ {shape:<16} {rows:>11} {mode:<17} '
+                          + (f'ERROR: {case["error"]}' if 'error' in case else
+                             f'{case["wall_s"]:>9.3f} s  {case["peak_rss_mb"]} MB  {case["file_reads"]} file reads  '
+                             f'{case["data_passes"]} passes'))
+    return {'meta': {'date': datetime.now().isoformat(timespec='seconds'), 'commit': _git_commit(),
+                     'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                     'platform': platform.platform(), 'workers': workers, 'chunk_size': chunk_size},
+            'results': results}
+
+
+def compare(new: dict, old: dict, threshold: float = 0.2) -> list:
+    """
+    Cases that are slower (or use more memory) than in an older benchmark.
+    :param new: Result of run_benchmark.
+    :param old: Older result (same format).
+    :param threshold: Allowed increase (0.2 = 20%).
+    :return: List of messages, empty if there are no regressions.
+    """
+    old_cases = {(case['shape'], case['rows'], case['mode']): case for case in old['results']}
+    regressions = []
+    for case in new['results']:
+        before = old_cases.get((case['shape'], case['rows'], case['mode']))
+        if before is None or 'error' in case or 'error' in before:
+            continue
+        for key in ['wall_s', 'peak_rss_mb', 'file_reads', 'data_passes']:
+            if before.get(key) and case.get(key) and case[key] > before[key] * (1 + threshold):
+                regressions.append(f'{case["shape"]} {case["rows"]} {case["mode"]}: '
+                                   f'{key} {before[key]} -> {case[key]}')
+    return regressions
+
+
+# MAIN =============================================================
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of DfInitCheck on synthetic data.')
+    parser.add_argument('--shapes', nargs='+', default=SHAPES, choices=SHAPES)
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROWS, help='i.e. 10000 100000 100000000')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--workers', type=int, default=4, help='Processes for profile_parallel.')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--max-memory-rows', type=int, default=10_000_000,
+                        help='Skip the in-memory modes above this number of rows.')
+    parser.add_argument('--data-dir', help='Keep the generated CSV files in this folder.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='Older JSON result to compare with.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed increase before a regression.')
+    parser.add_argument('--case', nargs=4, help=argparse.SUPPRESS)  # Internal: run one case in this process.
+    args = parser.parse_args()
+
+    if args.case:
+        case_mode, case_path, case_workers, case_chunk_size = args.case
+        print(json.dumps(run_case(case_mode, case_path, int(case_workers), int(case_chunk_size))))
+        sys.exit(0)
+
+    report = run_benchmark(args.shapes, args.rows, args.modes, args.workers, args.chunk_size,
+                           args.max_memory_rows, args.data_dir)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'+- Results saved in {args.output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            found = compare(report, json.load(file), args.threshold)
+        print('+-- Regressions:' if found else '+- No regressions found.')
+        for message in found:
+            print(f'+ {message}')
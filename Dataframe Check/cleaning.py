@@ -0,0 +1,179 @@
+"""
+    cleaning
+    Lazy cleaning plan: the steps are declared first and run in one streamed pass over the data.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from dataframecheck import CHUNK_SIZE
+from sketches import RowHashSet, hash_rows
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@dataclass
+class CleaningReport:
+    """
+        Result of CleaningPlan.execute.
+    """
+    rows_in: int = 0
+    rows_out: int = 0
+    removed: dict = field(default_factory=dict)  # Step description: rows removed by that step.
+    output_path: str = None
+
+    def __str__(self):
+        lines = [f'+-- Cleaning: {self.rows_in} rows in, {self.rows_out} rows out.']
+        lines.extend(f'+ {step}: {rows} rows removed.' for step, rows in self.removed.items())
+        if self.output_path:
+            lines.append(f'+- Saved in {self.output_path}')
+        return '\n'.join(lines)
+
+
+class CleaningPlan:
+    """
+        Declare the cleaning steps, nothing is done until execute (or apply) is called.
+        All steps run chunk by chunk in one pass over the data:
+            plan = CleaningPlan().dropna(subset=['CLOSE']).drop_duplicates().cast({'VOLUME': 'float32'})
+            report = plan.execute('example.csv', 'clean.parquet')
+    """
+    def __init__(self):
+        # List of (description, factory). Order matters.
+        # factory() is called at the start of every run and returns function(chunk) -> chunk, so a step with state
+        # (drop_duplicates) starts empty each time and the plan can be run again.
+        self.__steps = []
+
+    def __str__(self):
+        if not self.__steps:
+            return 'Empty cleaning plan.'
+        return '\n'.join(self.__step_names())
+
+    def __step_names(self) -> list:
+        # The position makes the names unique if the same step is used twice.
+        return [f'({position}) {description}' for position, (description, _) in enumerate(self.__steps)]
+
+    def dropna(self, subset: list = None, thresh: int = None) -> 'CleaningPlan':
+        """
+        Drop the rows with NaN values.
+        :param subset: Only look for NaN in these columns.
+        :param thresh: Keep the rows with at least thresh non-NaN values (instead of dropping any NaN).
+        :return: The plan (to chain steps).
+        """
+        options = {'subset': subset}
+        if thresh is not None:
+            options['thresh'] = thresh
+        description = f'dropna(subset={subset}, thresh={thresh})'
+        self.__steps.append((description, lambda: lambda chunk: chunk.dropna(**options)))
+        return self
+
+    def drop_duplicates(self, subset: list = None) -> 'CleaningPlan':
+        """
+        Drop the duplicated rows, keeping the first one. Works across chunks with 64-bit row hashes.
+        :param subset: Only compare these columns.
+        :return: The plan (to chain steps).
+        """
+        def factory():
+            seen = RowHashSet()  # New for every run.
+
+            def step(chunk):
+                return chunk[seen.first_seen(hash_rows(chunk if subset is None else chunk[subset]))]
+            return step
+
+        self.__steps.append((f'drop_duplicates(subset={subset})', factory))
+        return self
+
+    def cast(self, dtypes: dict) -> 'CleaningPlan':
+        """
+        Change the type of some columns.
+        :param dtypes: {column: dtype}.
+        :return: The plan (to chain steps).
+        """
+        self.__steps.append((f'cast({dtypes})', lambda: lambda chunk: chunk.astype(dtypes)))
+        return self
+
+    def filter(self, condition) -> 'CleaningPlan':
+        """
+        Keep only the rows that meet a condition.
+        :param condition: String for DataFrame.query or function(chunk) returning a boolean mask.
+        :return: The plan (to chain steps).
+        """
+        if isinstance(condition, str):
+            self.__steps.append((f'filter("{condition}")', lambda: lambda chunk: chunk.query(condition)))
+        else:
+            name = getattr(condition, '__name__', 'function')
+            self.__steps.append((f'filter({name})', lambda: lambda chunk: chunk[condition(chunk)]))
+        return self
+
+    def apply(self, df: pd.DataFrame) -> tuple:
+        """
+        Run the plan on a DataFrame already in memory.
+        :param df: DataFrame to clean (not modified).
+        :return: Clean DataFrame, CleaningReport.
+        """
+        report = CleaningReport(removed=dict.fromkeys(self.__step_names(), 0))
+        return self.__run_chunk(df, self.__build_steps(), report), report
+
+    def execute(self, source, output_path: str, chunk_size: int = CHUNK_SIZE, **read_csv_kwargs) -> CleaningReport:
+        """
+        Run the plan in one streamed pass and write the result to a Parquet (columnar) file.
+        The schema of the output is taken from the first chunk, use cast if a column type changes between chunks.
+        :param source: CSV file or any iterable of DataFrames (chunks).
+        :param output_path: Parquet file to create.
+        :param chunk_size: Rows read per chunk (CSV only).
+        :param read_csv_kwargs: Extra arguments for pd.read_csv.
+        :return: CleaningReport.
+        """
+        if pyarrow is None:
+            raise ImportError('+-- ERROR: pyarrow is required to write the Parquet output (pip install pyarrow).')
+        report = CleaningReport(removed=dict.fromkeys(self.__step_names(), 0), output_path=output_path)
+        steps = self.__build_steps()
+        writer = None
+        chunks = pd.read_csv(source, chunksize=chunk_size, **read_csv_kwargs) if isinstance(source, str) else source
+        try:
+            for chunk in chunks:
+                chunk = self.__run_chunk(chunk, steps, report)
+                if writer is None:
+                    table = pyarrow.Table.from_pandas(chunk, preserve_index=False)
+                    writer = pyarrow.parquet.ParquetWriter(output_path, table.schema)
+                else:
+                    try:
+                        table = pyarrow.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as error:
+                        raise ValueError(f'+-- ERROR: Column types changed between chunks ({error}). '
+                                         f'Add a cast step to the plan.') from error
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return report
+
+    def __build_steps(self) -> list:
+        """
+        Create the functions of the steps for one run.
+        :return: List of function(chunk) -> chunk.
+        """
+        return [factory() for _, factory in self.__steps]
+
+    def __run_chunk(self, chunk: pd.DataFrame, steps: list, report: CleaningReport) -> pd.DataFrame:
+        """
+        Run all the steps on one chunk and update the report.
+        :param chunk: DataFrame.
+        :param steps: Functions from __build_steps (the same for all the chunks of a run).
+        :param report: CleaningReport to update.
+        :return: Clean chunk.
+        """
+        report.rows_in += len(chunk)
+        for name, step in zip(self.__step_names(), steps):
+            rows = len(chunk)
+            chunk = step(chunk)
+            report.removed[name] += rows - len(chunk)
+        report.rows_out += len(chunk)
+        return chunk
@@ -4,46 +4,724 @@
     :copyright: (c) 2022 Juan Carcedo, All rights reserved
     :licence: MIT, see LICENSE.txt for further details.
 """
+import math
+import sqlite3
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
 import pandas as pd
 
+from profilecache import ProfileCache
+from sketches import HASH_VERSION, HashSample, HyperLogLog, RowHashSet, RowReservoir, hash_rows, hash_values
+
+try:
+    import pyarrow  # Optional: only used for arrow-backed strings in optimize_memory.
+except ImportError:
+    pyarrow = None
+
+# Default number of rows read per chunk when streaming a file.
+CHUNK_SIZE = 100_000
+# Number of rows shown as head/tail.
+PREVIEW_ROWS = 5
+# Default number of rows sampled by quick_profile.
+SAMPLE_SIZE = 10_000
+# Quantiles estimated by quick_profile.
+SAMPLE_QUANTILES = [0.25, 0.5, 0.75]
+# Rows of DataFrame.describe() for numeric columns.
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def _sizeof_fmt(num_bytes: float, suffix: str = '') -> str:
+    """
+    Human-readable size, same format used by DataFrame.info().
+    :param num_bytes: Size in bytes.
+    :param suffix: Added after the number ('+' if the real size is bigger).
+    :return: String like '15.1+ KB'.
+    """
+    for unit in ['bytes', 'KB', 'MB', 'GB', 'TB']:
+        if num_bytes < 1024.0:
+            return f'{num_bytes:3.1f}{suffix} {unit}'
+        num_bytes /= 1024.0
+    return f'{num_bytes:3.1f}{suffix} PB'
+
+
+def _index_summary(index: pd.Index) -> str:
+    """
+    Index line of DataFrame.info().
+    :param index: Index of the DataFrame.
+    :return: String like 'RangeIndex: 637 entries, 0 to 636'.
+    """
+    if not len(index):
+        return f'{type(index).__name__}: 0 entries'
+    return f'{type(index).__name__}: {len(index)} entries, {index[0]} to {index[-1]}'
+
+
+def _describe_block(block: np.ndarray) -> np.ndarray:
+    """
+    describe() numbers of a 2D float block (one column per column of the DataFrame).
+    Runs in the worker processes of DfInitCheck.profile, so it only receives the NumPy buffer.
+    :param block: 2D float64 array, NaN for missing values.
+    :return: 2D array with one row per DESCRIBE_INDEX item.
+    """
+    with warnings.catch_warnings():
+        # All-NaN columns return NaN, same as describe().
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        count = (~np.isnan(block)).sum(axis=0)
+        quartiles = np.nanpercentile(block, [25, 50, 75], axis=0)
+        return np.vstack([count, np.nanmean(block, axis=0), np.nanstd(block, axis=0, ddof=1),
+                          np.nanmin(block, axis=0), quartiles, np.nanmax(block, axis=0)])
+
+
+def _wilson_interval(successes: np.ndarray, n: int, z: float, fpc: float = 1.0) -> tuple:
+    """
+    Wilson score interval of a proportion (better than the normal one for rates close to 0 or 1).
+    Even with 0 successes the high end is above 0.
+    :param successes: Number of successes (array or number).
+    :param n: Sample size.
+    :param z: Normal quantile of the confidence level.
+    :param fpc: Finite population correction (0 when the sample is the whole population).
+    :return: Low, high.
+    """
+    p = successes / n
+    if fpc <= 0:
+        return p, p
+    # The correction shrinks the variance: same as a bigger sample.
+    n = n / (fpc * fpc)
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return np.clip(centre - margin, 0, 1), np.clip(centre + margin, 0, 1)
+
+
+def _sqlite_affinity(declared_type: str) -> str:
+    """
+    Column affinity of SQLite from the declared type (rules of the SQLite documentation).
+    :param declared_type: Type in CREATE TABLE (i.e. 'INTEGER', 'varchar(20)').
+    :return: 'INTEGER', 'TEXT', 'BLOB', 'REAL' or 'NUMERIC'.
+    """
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'INTEGER'
+    if any(name in declared_type for name in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if not declared_type or 'BLOB' in declared_type:
+        return 'BLOB'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'REAL'
+    return 'NUMERIC'
+
+
+def _quote_identifier(name: str) -> str:
+    """
+    Quote a table/column name for SQLite.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _merge_dtype(left, right):
+    """
+    Resolve the dtype of a column that was read in several chunks.
+    :param left: dtype seen so far.
+    :param right: dtype of the new chunk.
+    :return: Common dtype (object if the types cannot be combined).
+    """
+    if left == right:
+        return left
+    if (isinstance(left, np.dtype) and isinstance(right, np.dtype)
+            and pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right)
+            and not pd.api.types.is_bool_dtype(left) and not pd.api.types.is_bool_dtype(right)):
+        # i.e. int64 in one chunk and float64 (int with NaN) in another one.
+        return np.result_type(left, right)
+    return np.dtype(object)
+
+
+@dataclass
+class DfProfile:
+    """
+        Result of the checks of a DataFrame. Nothing is printed here, use DfInitCheck.print_profile.
+    """
+    rows: int
+    columns: int
+    dtypes: pd.Series
+    counts: pd.Series  # Non-null values per column.
+    na_counts: pd.Series
+    describe: pd.DataFrame
+    head: pd.DataFrame
+    tail: pd.DataFrame
+    duplicated: int
+    memory_usage: int  # Bytes, without the contents of object columns (same as info()).
+    index: str = ''  # Index line of info() (empty: RangeIndex from 0 to rows - 1).
+    note: str = ''  # Extra line for the report, i.e. how the data was read.
+    distinct: pd.Series = None  # Distinct values per column (None if not computed).
+    distinct_approx: bool = False  # True if distinct comes from HyperLogLog.
+
+    @property
+    def has_na(self) -> bool:
+        return bool(self.na_counts.any())
+
+
+@dataclass
+class SampleProfile:
+    """
+        ESTIMATES of the checks of a file from a random sample (see DfInitCheck.quick_profile).
+        Every table has the columns estimate, low and high (confidence interval).
+    """
+    rows: int  # Rows in the file (exact, the whole file is streamed).
+    sample_size: int
+    confidence: float
+    na_rate: pd.DataFrame  # One row per column.
+    duplicate_rate: pd.Series  # estimate, low, high.
+    means: pd.DataFrame  # One row per numeric column.
+    quantiles: pd.DataFrame  # One row per (numeric column, quantile).
+    sample: pd.DataFrame
+
+
+class ChunkProfiler:
+    """
+        Running totals of the check_df statistics.
+        Feed it chunks with update(), only the totals are kept in memory.
+        Duplicates use 64-bit row hashes (8 bytes per distinct row).
+    """
+    def __init__(self, distinct: bool = False, precision: int = 14):
+        """
+        :param distinct: Also estimate the distinct values per column (HyperLogLog, fixed memory).
+        :param precision: HyperLogLog precision (2 ** precision bytes per column).
+        """
+        self.rows = 0
+        self.columns = None
+        self.dtypes = None
+        self.counts = None
+        self.na_counts = None
+        # Numeric stats per column: [n, mean, m2, min, max] (m2 = sum of squared deviations).
+        self.stats = {}
+        self.head = None
+        self.tail = None
+        self.duplicated = 0
+        self.memory_usage = 0
+        self.__row_hashes = RowHashSet()
+        self.__distinct = distinct
+        self.__precision = precision
+        self.sketches = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Add a new chunk to the running totals.
+        :param chunk: DataFrame with the same columns as the previous chunks.
+        :return: None.
+        """
+        if self.columns is None:
+            self.columns = chunk.columns
+            if self.__distinct:
+                self.sketches = {col: HyperLogLog(self.__precision) for col in chunk.columns}
+            self.dtypes = chunk.dtypes.copy()
+            self.counts = pd.Series(0, index=chunk.columns, dtype='int64')
+            self.na_counts = pd.Series(0, index=chunk.columns, dtype='int64')
+            self.head = chunk.head(PREVIEW_ROWS)
+        else:
+            self.dtypes = pd.Series([_merge_dtype(self.dtypes[col], chunk.dtypes[col]) for col in self.columns],
+                                    index=self.columns, dtype=object)
+
+        na_chunk = chunk.isna().sum()
+        self.rows += len(chunk)
+        self.memory_usage += int(chunk.memory_usage(deep=False).sum())
+        self.na_counts += na_chunk
+        self.counts += len(chunk) - na_chunk
+        self.tail = pd.concat([self.tail, chunk.tail(PREVIEW_ROWS)]).tail(PREVIEW_ROWS)
+
+        # Mean and std are merged with the parallel variance formula (Chan et al.).
+        numbers = chunk.select_dtypes(include='number')
+        n_b, mean_b, min_b, max_b = numbers.count(), numbers.mean(), numbers.min(), numbers.max()
+        m2_b = numbers.var(ddof=0) * n_b
+        for col in numbers.columns:
+            if n_b[col] == 0:
+                continue
+            if col not in self.stats:
+                self.stats[col] = [n_b[col], mean_b[col], m2_b[col], min_b[col], max_b[col]]
+                continue
+            n_a, mean_a, m2_a, min_a, max_a = self.stats[col]
+            n = n_a + n_b[col]
+            delta = mean_b[col] - mean_a
+            self.stats[col] = [n,
+                               mean_a + delta * n_b[col] / n,
+                               m2_a + m2_b[col] + delta ** 2 * n_a * n_b[col] / n,
+                               min(min_a, min_b[col]),
+                               max(max_a, max_b[col])]
+
+        # Duplicates: only a 64-bit hash of every distinct row is kept, not the rows.
+        self.duplicated += self.__row_hashes.add(hash_rows(chunk))
+        for col, sketch in self.sketches.items():
+            sketch.add(hash_values(chunk[col]))
+
+    def describe(self) -> pd.DataFrame:
+        """
+        Same as DataFrame.describe() for numeric columns, without the quartiles (not mergeable).
+        :return: DataFrame with count, mean, std, min and max per numeric column.
+        """
+        data = {}
+        for col in self.columns:
+            if col not in self.stats or not pd.api.types.is_numeric_dtype(self.dtypes[col]) \
+                    or pd.api.types.is_bool_dtype(self.dtypes[col]):
+                continue
+            n, mean, m2, min_value, max_value = self.stats[col]
+            std = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+            data[col] = [n, mean, std, min_value, max_value]
+        return pd.DataFrame(data, index=['count', 'mean', 'std', 'min', 'max'])
+
+    def to_profile(self, note: str = '') -> DfProfile:
+        """
+        Current totals as a DfProfile.
+        :param note: Extra line for the report.
+        :return: DfProfile.
+        """
+        return DfProfile(rows=self.rows, columns=len(self.columns), dtypes=self.dtypes, counts=self.counts,
+                         na_counts=self.na_counts, describe=self.describe(), head=self.head, tail=self.tail,
+                         duplicated=self.duplicated, memory_usage=self.memory_usage, note=note,
+                         distinct=pd.Series({col: sketch.count() for col, sketch in self.sketches.items()},
+                                            dtype='int64') if self.sketches else None,
+                         distinct_approx=bool(self.sketches))
+
 
 class DfInitCheck:
     """
         Use check_df class method to run some basic checks.
-        Delete na members with remove_na
+        Use check_csv for files that do not fit in memory.
+        profile/profile_csv return the same checks as a DfProfile (no printing).
+        Delete na members with remove_na (see cleaning.CleaningPlan for big files).
     """
     @classmethod
-    def check_df(cls, df_check) -> None:
-        """Useful checks to see df data """
-        print('\n\n---- Basic checks to overview the dataframe ----')
-        print(f'Shape: \n- Rows: {df_check.shape[0]}\n- Columns: {df_check.shape[1]}')
-        print(f'Types of columns:\n {df_check.dtypes}')
-        # print(f'Column names: {df_check.columns}')
-        print(f'Number of data per column:\n{df_check.count()}\n')
+    def profile(cls, df_check: pd.DataFrame, workers: int = 1, block_size: int = None,
+                duplicates: str = 'exact', distinct: str = None) -> DfProfile:
+        """
+        Compute all the checks of check_df without printing anything.
+        :param df_check: DataFrame to check.
+        :param workers: Number of processes used for the numeric columns. 1 = no parallelism.
+         Only worth it for very wide frames.
+        :param block_size: Columns sent to each worker at once. Default: 4 blocks per worker.
+        :param duplicates: 'exact' uses DataFrame.duplicated (fine for small data),
+         'hash' compares 64-bit row hashes (much less memory for big frames).
+        :param distinct: Distinct values per column. None (skip), 'exact' (nunique) or 'approx' (HyperLogLog).
+        :return: DfProfile.
+        """
+        assert duplicates in ('exact', 'hash'), f'+-- ERROR: Unknown duplicates mode "{duplicates}".'
+        assert distinct in (None, 'exact', 'approx'), f'+-- ERROR: Unknown distinct mode "{distinct}".'
+        numbers = df_check.select_dtypes(include='number')
+        if workers > 1 and numbers.shape[1] > 1:
+            describe, na_numbers = cls.__describe_parallel(numbers, workers, block_size)
+            others = df_check.columns.difference(numbers.columns, sort=False)
+            na_counts = pd.concat([na_numbers, df_check[others].isna().sum()]).reindex(df_check.columns)
+        else:
+            # isna and duplicated are computed once and reused (counts = rows - na).
+            na_counts = df_check.isna().sum()
+            describe = df_check.describe()
+        if duplicates == 'hash':
+            duplicated = RowHashSet().add(hash_rows(df_check))
+        else:
+            duplicated = int(df_check.duplicated().sum())
+        if distinct == 'approx':
+            sketches = {col: HyperLogLog() for col in df_check.columns}
+            for col, sketch in sketches.items():
+                sketch.add(hash_values(df_check[col]))
+            distinct_counts = pd.Series({col: sketch.count() for col, sketch in sketches.items()}, dtype='int64')
+        elif distinct == 'exact':
+            distinct_counts = df_check.nunique()
+        else:
+            distinct_counts = None
+        return DfProfile(rows=df_check.shape[0], columns=df_check.shape[1], dtypes=df_check.dtypes,
+                         counts=df_check.shape[0] - na_counts, na_counts=na_counts,
+                         describe=describe, head=df_check.head(PREVIEW_ROWS),
+                         tail=df_check.tail(PREVIEW_ROWS), duplicated=duplicated,
+                         memory_usage=int(df_check.memory_usage(deep=False).sum()),
+                         index=_index_summary(df_check.index), distinct=distinct_counts,
+                         distinct_approx=distinct == 'approx')
+
+    @classmethod
+    def __describe_parallel(cls, numbers: pd.DataFrame, workers: int, block_size: int = None) -> tuple:
+        """
+        describe() of the numeric columns split in blocks of columns and run in a process pool.
+        Workers get a float64 NumPy buffer per block (pickled), not a copy of the DataFrame.
+        :param numbers: Numeric columns of the DataFrame.
+        :param workers: Number of processes.
+        :param block_size: Columns per block.
+        :return: describe DataFrame, Series with the NaN count per column.
+        """
+        if block_size is None:
+            block_size = max(1, math.ceil(numbers.shape[1] / (workers * 4)))
+        blocks = [numbers.columns[start:start + block_size] for start in range(0, numbers.shape[1], block_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_describe_block,
+                                   (numbers[cols].to_numpy(dtype='float64', na_value=np.nan) for cols in blocks))
+            describe = pd.DataFrame(np.hstack(list(results)), index=DESCRIBE_INDEX, columns=numbers.columns)
+        return describe, numbers.shape[0] - describe.loc['count'].astype('int64')
+
+    @classmethod
+    def profile_csv(cls, path_to_csv: str, chunk_size: int = CHUNK_SIZE, distinct: bool = False,
+                    cache: ProfileCache = None, **read_csv_kwargs) -> DfProfile:
+        """
+        Same as profile but streaming a CSV file in chunks (memory capped at one chunk).
+        Duplicates are found with 64-bit row hashes.
+        :param path_to_csv: CSV file to check.
+        :param chunk_size: Number of rows read per chunk.
+        :param distinct: Estimate the distinct values per column (HyperLogLog).
+        :param cache: ProfileCache to reuse the profile of unchanged (or only appended) files.
+        :param read_csv_kwargs: Extra arguments for pd.read_csv (sep, encoding...).
+        :return: DfProfile. Note describe() has no quartiles (they cannot be merged between chunks).
+        """
+        note = f'Read in chunks of {chunk_size} rows (memory usage estimated).'
+        settings = (distinct, sorted(read_csv_kwargs.items()), HASH_VERSION)
+        lookup = cache.load(path_to_csv, settings) if cache is not None else None
+
+        if lookup is not None and lookup.status == 'hit':
+            return lookup.profiler.to_profile(note='Loaded from the profile cache (memory usage estimated).')
+
+        if lookup is not None and lookup.status == 'append':
+            # Only the new rows: read from the old end of the file, without header.
+            profiler = lookup.profiler
+            tail_kwargs = {key: value for key, value in read_csv_kwargs.items()
+                           if key not in ('header', 'names', 'skiprows')}
+            with open(path_to_csv, 'rb') as file:
+                file.seek(lookup.offset)
+                with pd.read_csv(file, chunksize=chunk_size, header=None, names=list(profiler.columns),
+                                 **tail_kwargs) as reader:
+                    for chunk in reader:
+                        chunk.index += profiler.rows  # Keep the row numbers of the full file.
+                        profiler.update(chunk)
+            note = f'{note}\nNew rows merged into the cached profile.'
+        else:
+            profiler = ChunkProfiler(distinct=distinct)
+            with pd.read_csv(path_to_csv, chunksize=chunk_size, **read_csv_kwargs) as reader:
+                for chunk in reader:
+                    profiler.update(chunk)
+        if profiler.columns is None:
+            raise ValueError(f'No data found in {path_to_csv}.')
+
+        if cache is not None:
+            cache.save(path_to_csv, profiler, settings, lookup.fingerprint)
+        return profiler.to_profile(note=note)
+
+    @classmethod
+    def print_profile(cls, profile: DfProfile, file=None) -> None:
+        """
+        Print a DfProfile in the terminal (or any other text stream).
+        :param profile: Result of profile or profile_csv.
+        :param file: Stream to write to. Default: sys.stdout.
+        :return: None.
+        """
+        out = sys.stdout if file is None else file
+        lines = ['\n\n---- Basic checks to overview the dataframe ----',
+                 f'Shape: \n- Rows: {profile.rows}\n- Columns: {profile.columns}',
+                 f'Types of columns:\n {profile.dtypes}',
+                 f'Number of data per column:\n{profile.counts}\n']
         pd.options.display.max_columns = None  # Prompt to show all columns
-        print(f'Basic data: {df_check.describe()}')
-        print(f'Head:\n{df_check.head()} \n Tail:\n{df_check.tail()}')
+        lines.append(f'Basic data: {profile.describe}')
+        lines.append(f'Head:\n{profile.head} \n Tail:\n{profile.tail}')
         # na values
-        if df_check.isna().values.any():
-            print('Found na values in columns:')
-            print(df_check.isna().sum())
+        if profile.has_na:
+            lines.append(f'Found na values in columns:\n{profile.na_counts}')
         else:
-            print('No na values.')
+            lines.append('No na values.')
         # duplicated values
-        if df_check.duplicated().values.any():
-            print(f'There are {len(df_check[df_check.duplicated()])} duplicated values.')
+        if profile.duplicated:
+            lines.append(f'There are {profile.duplicated} duplicated values.')
         else:
-            print('No duplicated values found.')
-        print('---- ----------------------- ----')
-        df_check.info()
+            lines.append('No duplicated values found.')
+        if profile.distinct is not None:
+            prefix = '~' if profile.distinct_approx else ''
+            lines.append('Distinct values per column:')
+            lines.extend(f'- {col}: {prefix}{count}' for col, count in profile.distinct.items())
+        lines.append('---- ----------------------- ----')
+        # Same table as DataFrame.info() but built from the profile (no new pass over the data).
+        lines.append("<class 'pandas.core.frame.DataFrame'>")
+        lines.append(profile.index or _index_summary(pd.RangeIndex(profile.rows)))
+        lines.append(f'Data columns (total {profile.columns} columns):')
+        # Columns of the table (header, separator and one cell per column), left aligned and 2 spaces apart.
+        table = [[' # ', '---'] + [f' {position}' for position in range(profile.columns)],
+                 ['Column', '------'] + [str(col) for col in profile.dtypes.index],
+                 ['Non-Null Count', '-' * 14] + [f'{count} non-null' for count in profile.counts],
+                 ['Dtype', '-' * 5] + [str(dtype) for dtype in profile.dtypes]]
+        widths = [max(len(cell) for cell in cells) for cells in table]
+        lines.extend('  '.join(cell.ljust(width) for cell, width in zip(row, widths)) for row in zip(*table))
+        # '+' as in info(): the contents of object columns are not included.
+        dtype_counts = profile.dtypes.astype(str).value_counts().sort_index()
+        lines.append('dtypes: ' + ', '.join(f'{dtype}({count})' for dtype, count in dtype_counts.items()))
+        plus = '+' if (profile.dtypes == object).any() else ''
+        lines.append(f'memory usage: {_sizeof_fmt(profile.memory_usage, plus)}')
+        if profile.note:
+            lines.append(profile.note)
+        out.write('\n'.join(lines) + '\n')
+
+    @classmethod
+    def check_df(cls, df_check) -> None:
+        """Useful checks to see df data """
+        cls.print_profile(cls.profile(df_check))
+
+    @classmethod
+    def check_csv(cls, path_to_csv: str, chunk_size: int = CHUNK_SIZE, distinct: bool = False,
+                  cache: ProfileCache = None, **read_csv_kwargs) -> None:
+        """
+        Same checks as check_df but streaming the file in chunks (memory capped at one chunk).
+        :param path_to_csv: CSV file to check.
+        :param chunk_size: Number of rows read per chunk.
+        :param distinct: Estimate the distinct values per column (HyperLogLog).
+        :param cache: ProfileCache to reuse the profile of unchanged (or only appended) files.
+        :param read_csv_kwargs: Extra arguments for pd.read_csv (sep, encoding...).
+        :return: None.
+        """
+        cls.print_profile(cls.profile_csv(path_to_csv, chunk_size, distinct, cache, **read_csv_kwargs))
+
+    @classmethod
+    def profile_sql(cls, source, table_name: str, chunk_size: int = CHUNK_SIZE, pushdown: bool = True,
+                    distinct: bool = False) -> DfProfile:
+        """
+        Same checks as check_df for a table of a SQLite database, without loading the table in memory.
+        - pushdown=True: counts, NaN (NULL) counts, min, max, mean, std and duplicates are computed by SQLite
+          (aggregate queries), only head and tail are read into pandas. Types come from the declared columns.
+        - pushdown=False: the table is read in chunks with pd.read_sql and profiled like profile_csv.
+        :param source: sqlite3.Connection or DataBase instance (SQLite Test).
+        :param table_name: Table to check.
+        :param chunk_size: Rows per chunk (pushdown=False only).
+        :param pushdown: Let SQLite do the work where possible.
+        :param distinct: Distinct values per column (exact COUNT(DISTINCT) with pushdown, HyperLogLog otherwise).
+        :return: DfProfile. Note describe() has no quartiles.
+        """
+        connection = getattr(source, 'connection', source)
+        table = _quote_identifier(table_name)
+        if not pushdown:
+            profiler = ChunkProfiler(distinct=distinct)
+            for chunk in pd.read_sql(f'SELECT * FROM {table}', connection, chunksize=chunk_size):
+                chunk.index += profiler.rows  # Keep the row numbers of the full table.
+                profiler.update(chunk)
+            if profiler.columns is None:
+                raise ValueError(f'No data found in table {table_name}.')
+            return profiler.to_profile(note=f'Read from SQLite in chunks of {chunk_size} rows '
+                                            f'(memory usage estimated).')
+
+        table_info = connection.execute(f'PRAGMA table_info({table})').fetchall()
+        if not table_info:
+            raise ValueError(f'Table {table_name} not found.')
+        names = [column[1] for column in table_info]
+        affinity = {column[1]: _sqlite_affinity(column[2]) for column in table_info}
+        numeric = [name for name in names if affinity[name] in ('INTEGER', 'REAL', 'NUMERIC')]
+
+        # One scan: row count, non-null count per column, min, max and mean of the numeric columns.
+        select = ['COUNT(*)'] + [f'COUNT({_quote_identifier(name)})' for name in names]
+        for name in numeric:
+            column = _quote_identifier(name)
+            select += [f'MIN({column})', f'MAX({column})', f'AVG({column})']
+        reply = connection.execute(f'SELECT {", ".join(select)} FROM {table}').fetchone()
+        rows = reply[0]
+        counts = pd.Series(reply[1:len(names) + 1], index=names, dtype='int64')
+        aggregates = reply[len(names) + 1:]
+        stats = {name: aggregates[3 * position:3 * position + 3] for position, name in enumerate(numeric)}
+
+        # Second scan for the std, with the mean already known (more stable than the sum of squares).
+        std = {}
+        if numeric and rows:
+            squares = [f'SUM(({_quote_identifier(name)} - ?) * ({_quote_identifier(name)} - ?))' for name in numeric]
+            means = [value for name in numeric for value in (stats[name][2] or 0, stats[name][2] or 0)]
+            sums = connection.execute(f'SELECT {", ".join(squares)} FROM {table}', means).fetchone()
+            std = {name: np.sqrt(total / (counts[name] - 1)) if counts[name] > 1 and total is not None else np.nan
+                   for name, total in zip(numeric, sums)}
+        describe = pd.DataFrame({name: [counts[name], stats[name][2], std.get(name, np.nan),
+                                        stats[name][0], stats[name][1]] for name in numeric},
+                                index=['count', 'mean', 'std', 'min', 'max'], dtype='float64')
+
+        distinct_rows = connection.execute(f'SELECT COUNT(*) FROM (SELECT DISTINCT * FROM {table})').fetchone()[0]
+        distinct_counts = None
+        if distinct:
+            select = [f'COUNT(DISTINCT {_quote_identifier(name)})' for name in names]
+            distinct_counts = pd.Series(connection.execute(f'SELECT {", ".join(select)} FROM {table}').fetchone(),
+                                        index=names, dtype='int64')
+
+        head = pd.read_sql(f'SELECT * FROM {table} LIMIT {PREVIEW_ROWS}', connection)
+        try:
+            tail = pd.read_sql(f'SELECT * FROM {table} ORDER BY rowid DESC LIMIT {PREVIEW_ROWS}', connection)
+            tail = tail.iloc[::-1]
+        except (pd.errors.DatabaseError, sqlite3.OperationalError):
+            # WITHOUT ROWID table.
+            tail = pd.read_sql(f'SELECT * FROM {table} LIMIT {PREVIEW_ROWS} '
+                               f'OFFSET {max(0, rows - PREVIEW_ROWS)}', connection)
+        tail.index = range(max(0, rows - len(tail)), rows)
+
+        # Types as pandas would load them: INTEGER with NULLs becomes float64.
+        dtypes = pd.Series({name: np.dtype('int64') if affinity[name] == 'INTEGER' and counts[name] == rows
+                            else np.dtype('float64') if affinity[name] in ('INTEGER', 'REAL', 'NUMERIC')
+                            else np.dtype(object) for name in names}, dtype=object)
+        return DfProfile(rows=rows, columns=len(names), dtypes=dtypes, counts=counts, na_counts=rows - counts,
+                         describe=describe, head=head, tail=tail, duplicated=rows - distinct_rows,
+                         memory_usage=rows * len(names) * 8, note='Computed by SQLite (memory usage estimated).',
+                         distinct=distinct_counts)
+
+    @classmethod
+    def check_sql(cls, source, table_name: str, chunk_size: int = CHUNK_SIZE, pushdown: bool = True,
+                  distinct: bool = False) -> None:
+        """
+        Print the checks of a SQLite table. See profile_sql for the parameters.
+        :return: None.
+        """
+        cls.print_profile(cls.profile_sql(source, table_name, chunk_size, pushdown, distinct))
+
+    @classmethod
+    def quick_profile(cls, path_to_csv: str, sample_size: int = SAMPLE_SIZE, confidence: float = 0.95,
+                      seed: int = None, chunk_size: int = CHUNK_SIZE, **read_csv_kwargs) -> SampleProfile:
+        """
+        Fast overview of a big file: a random sample of rows is kept while streaming the file and the
+        NaN rates, duplicate rate, means and quartiles are ESTIMATED from it with a confidence interval.
+        The duplicate rate uses a separate sample of row hashes (all copies of a row are kept together).
+        :param path_to_csv: CSV file to check.
+        :param sample_size: Rows kept in the sample.
+        :param confidence: Confidence level of the intervals (0.95 = 95%).
+        :param seed: Seed of the random sample (same seed, same sample).
+        :param chunk_size: Number of rows read per chunk.
+        :param read_csv_kwargs: Extra arguments for pd.read_csv (sep, encoding...).
+        :return: SampleProfile.
+        """
+        reservoir = RowReservoir(sample_size, seed)
+        hash_sample = HashSample(sample_size)
+        with pd.read_csv(path_to_csv, chunksize=chunk_size, **read_csv_kwargs) as reader:
+            for chunk in reader:
+                reservoir.add(chunk)
+                hash_sample.add(hash_rows(chunk))
+        if reservoir.sample is None or not len(reservoir.sample):
+            raise ValueError(f'No data found in {path_to_csv}.')
+
+        sample = reservoir.sample.sort_index()
+        rows, n = reservoir.rows_seen, len(sample)
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        # Finite population correction: the intervals shrink to 0 when the sample is the whole file.
+        fpc = np.sqrt((rows - n) / (rows - 1)) if rows > 1 else 0.0
+        exact = n == rows
+
+        na_counts = sample.isna().sum()
+        low, high = _wilson_interval(na_counts.to_numpy(), n, z, fpc)
+        na_rate = pd.DataFrame({'estimate': na_counts / n, 'low': low, 'high': high}, index=sample.columns)
+
+        # Duplicate rate = extra copies / rows of the hash sample (a proportion, Wilson interval).
+        # The copies of a row are sampled together, so the sample size is the number of distinct rows
+        # (not the rows): wider but honest interval.
+        copies = hash_sample.counts
+        sampled_rows, distinct_rows = int(copies.sum()), len(copies)
+        duplicate_fraction = (sampled_rows - distinct_rows) / sampled_rows
+        hash_fpc = np.sqrt((rows - sampled_rows) / (rows - 1)) if rows > 1 else 0.0
+        low, high = _wilson_interval(duplicate_fraction * distinct_rows, distinct_rows, z, hash_fpc)
+        duplicate_rate = pd.Series({'estimate': duplicate_fraction, 'low': float(low), 'high': float(high)})
+
+        numbers = sample.select_dtypes(include='number')
+        counts = numbers.count()
+        margin = z * numbers.std() / np.sqrt(counts) * fpc
+        means = pd.DataFrame({'estimate': numbers.mean(), 'low': numbers.mean() - margin,
+                              'high': numbers.mean() + margin})
+
+        # Quantiles: interval between the order statistics around rank m * q (binomial approximation).
+        quantile_rows = []
+        for col in numbers.columns:
+            values = np.sort(numbers[col].dropna().to_numpy())
+            m = len(values)
+            for q in SAMPLE_QUANTILES:
+                if not m:
+                    quantile_rows.append((col, q, np.nan, np.nan, np.nan))
+                    continue
+                spread = 0 if exact else z * np.sqrt(m * q * (1 - q))
+                low_rank = int(np.clip(np.floor(m * q - spread), 0, m - 1))
+                high_rank = int(np.clip(np.ceil(m * q + spread), 0, m - 1))
+                quantile_rows.append((col, q, np.quantile(values, q), values[low_rank], values[high_rank]))
+        quantiles = pd.DataFrame(quantile_rows, columns=['column', 'quantile', 'estimate', 'low', 'high'])
+
+        return SampleProfile(rows=rows, sample_size=n, confidence=confidence, na_rate=na_rate,
+                             duplicate_rate=duplicate_rate, means=means,
+                             quantiles=quantiles.set_index(['column', 'quantile']), sample=sample)
+
+    @classmethod
+    def print_sample_profile(cls, profile: SampleProfile, file=None) -> None:
+        """
+        Print a SampleProfile in the terminal (or any other text stream).
+        :param profile: Result of quick_profile.
+        :param file: Stream to write to. Default: sys.stdout.
+        :return: None.
+        """
+        out = sys.stdout if file is None else file
+        level = f'{profile.confidence:.0%}'
+        pd.options.display.max_columns = None  # Prompt to show all columns
+        lines = ['\n\n---- Quick check: ESTIMATES from a random sample ----',
+                 f'Sample size: {profile.sample_size} of {profile.rows} rows. '
+                 f'Intervals with {level} confidence (low - high).',
+                 f'Columns: {profile.sample.shape[1]}',
+                 f'Types of columns (sample):\n {profile.sample.dtypes}',
+                 f'Estimated NaN rate per column:\n{profile.na_rate}',
+                 f'Estimated duplicate rate: {profile.duplicate_rate["estimate"]:.2%} '
+                 f'({profile.duplicate_rate["low"]:.2%} - {profile.duplicate_rate["high"]:.2%})',
+                 f'Estimated mean per column:\n{profile.means}',
+                 f'Estimated quantiles per column:\n{profile.quantiles}',
+                 '---- These values are ESTIMATES, use check_csv for exact numbers ----']
+        out.write('\n'.join(lines) + '\n')
+
+    @classmethod
+    def quick_check(cls, path_to_csv: str, sample_size: int = SAMPLE_SIZE, confidence: float = 0.95,
+                    seed: int = None, chunk_size: int = CHUNK_SIZE, **read_csv_kwargs) -> None:
+        """
+        Print the estimates of quick_profile. See quick_profile for the parameters.
+        :return: None.
+        """
+        cls.print_sample_profile(cls.quick_profile(path_to_csv, sample_size, confidence, seed, chunk_size,
+                                                   **read_csv_kwargs))
+
+    @classmethod
+    def optimize_memory(cls, df_check: pd.DataFrame, float_tolerance: float = 1e-6,
+                        category_ratio: float = 0.5, arrow_strings: bool = True) -> tuple:
+        """
+        Downcast the columns that can be stored in a smaller dtype without losing data.
+        - int64 -> int8/16/32 (uint for unsigned columns).
+        - float64 -> float32 if all the values are equal within float_tolerance (relative).
+        - object/strings -> category if there are few distinct values.
+        - Other strings -> pyarrow strings (only if pyarrow is installed).
+        The original DataFrame is not modified.
+        :param df_check: DataFrame to optimize.
+        :param float_tolerance: Max relative difference allowed between float64 and float32 values.
+        :param category_ratio: Max distinct values / rows to convert to category.
+        :param arrow_strings: Use pyarrow strings if available.
+        :return: New DataFrame, DataFrame with the memory (bytes) per column before and after.
+        """
+        optimized = df_check.copy(deep=False)
+        report = []
+        for col in df_check.columns:
+            series = df_check[col]
+            new_series = series
+            dtype = series.dtype
+            if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+                new_series = pd.to_numeric(series, downcast='integer' if dtype.kind == 'i' else 'unsigned')
+            elif isinstance(dtype, np.dtype) and dtype.kind == 'f' and dtype.itemsize > 4:
+                candidate = series.astype('float32')
+                if np.allclose(candidate.to_numpy(dtype='float64'), series.to_numpy(), rtol=float_tolerance,
+                               atol=0, equal_nan=True):
+                    new_series = candidate
+            elif dtype == object or isinstance(dtype, pd.StringDtype):
+                if len(series) and series.nunique(dropna=False) / len(series) <= category_ratio:
+                    new_series = series.astype('category')
+                elif arrow_strings and pyarrow is not None and pd.api.types.infer_dtype(series) == 'string':
+                    new_series = series.astype('string[pyarrow]')
+
+            before = int(series.memory_usage(index=False, deep=True))
+            after = int(new_series.memory_usage(index=False, deep=True))
+            if after >= before:
+                # Nothing to gain, keep the original column.
+                new_series, after = series, before
+            else:
+                optimized[col] = new_series
+            report.append({'column': col, 'dtype_before': str(dtype), 'dtype_after': str(new_series.dtype),
+                           'bytes_before': before, 'bytes_after': after, 'saved': before - after})
+
+        report = pd.DataFrame(report, columns=['column', 'dtype_before', 'dtype_after',
+                                               'bytes_before', 'bytes_after', 'saved']).set_index('column')
+        return optimized, report
 
     @classmethod
     def remove_na(cls, df_check) -> bool:
-        if df_check.isna().values.any():
-            # print(df_check[df_check.isna().values == True])  # Show the NaN values
-            df_check.dropna(inplace=True)  # Drop the NaN values
-            return True
-        return False
+        # Single pass: dropna already finds the NaN values, compare the rows before and after.
+        rows = len(df_check)
+        df_check.dropna(inplace=True)  # Drop the NaN values
+        return len(df_check) < rows
 
     def __str__(self):
         return 'Please use a DataFrame as argument. Expected return is a set of commands in terminal.'
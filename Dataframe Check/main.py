@@ -12,6 +12,9 @@ if __name__ == '__main__':
     file_to_check = 'example.csv'
     df_test = pd.read_csv(file_to_check)
     DfInitCheck.check_df(df_test)  # Check the dataframe
+    # For files that do not fit in memory, stream them instead:
+    # DfInitCheck.check_csv(file_to_check, chunk_size=100_000)
+    # Add cache=ProfileCache() (from profilecache import ProfileCache) to skip files already profiled.
     # --- Data cleaning ---
     # Search for NaN data and delete if needed
     print('Checking dataframe for NaN values...')
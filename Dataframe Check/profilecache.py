@@ -0,0 +1,130 @@
+"""
+    profilecache
+    On-disk cache of the streaming profiles of DfInitCheck, so unchanged files are not profiled again.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+import hashlib
+import os
+import pickle
+from collections import namedtuple
+
+# Size of the blocks read to compute the content hash.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# status: 'hit', 'append' or 'miss'.
+# profiler: cached ChunkProfiler (None on a miss).
+# offset: bytes of the file already profiled (only for 'append').
+# fingerprint: (size, mtime, digest) of the file now, None if not computed.
+CacheLookup = namedtuple('CacheLookup', ['status', 'profiler', 'offset', 'fingerprint'])
+
+
+def _file_digest(path: str, prefix_size: int = None) -> tuple:
+    """
+    BLAKE2 hash of the file, optionally also of its first prefix_size bytes (same read).
+    :param path: File to hash.
+    :param prefix_size: Size of the prefix to hash too.
+    :return: Full digest, prefix digest (None if prefix_size is None).
+    """
+    hasher = hashlib.blake2b()
+    prefix_digest = None
+    read = 0
+    with open(path, 'rb') as file:
+        while True:
+            if prefix_size is not None and prefix_digest is None:
+                # Do not read over the prefix boundary before taking its digest.
+                block = file.read(min(HASH_BLOCK_SIZE, prefix_size - read))
+                read += len(block)
+                hasher.update(block)
+                if read == prefix_size:
+                    prefix_digest = hasher.copy().hexdigest()
+                if block:
+                    continue
+            block = file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest(), prefix_digest
+
+
+class ProfileCache:
+    """
+        Stores one ChunkProfiler per file in cache_dir (pickle, only use a trusted folder).
+        The key is the file path plus its size, mtime and content hash:
+        - Same size and mtime (or same content): hit, the stored profile is returned.
+        - The file grew and the old content is unchanged: append, only the new rows are profiled.
+        - Anything else: miss, the file is profiled again.
+    """
+    def __init__(self, cache_dir: str = '.profile_cache'):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __entry_path(self, path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def load(self, path: str, settings: tuple = ()) -> CacheLookup:
+        """
+        Look for the profile of a file. If only its mtime changed, the entry is updated with the new one.
+        :param path: File profiled.
+        :param settings: Options used to build the profile. A profile built with other options is a miss.
+        :return: CacheLookup.
+        """
+        entry_path = self.__entry_path(path)
+        if not os.path.exists(entry_path):
+            return CacheLookup('miss', None, 0, None)
+        with open(entry_path, 'rb') as file:
+            entry = pickle.load(file)
+        if entry['settings'] != settings:
+            return CacheLookup('miss', None, 0, None)
+
+        stat = os.stat(path)
+        old_size, old_mtime, old_digest = entry['fingerprint']
+        if stat.st_size == old_size and stat.st_mtime_ns == old_mtime:
+            return CacheLookup('hit', entry['profiler'], old_size, entry['fingerprint'])
+        if stat.st_size < old_size:
+            return CacheLookup('miss', None, 0, None)
+
+        digest, prefix_digest = _file_digest(path, old_size)
+        fingerprint = (stat.st_size, stat.st_mtime_ns, digest)
+        if digest == old_digest:
+            # Only touched: same content. Store the new mtime so the next load does not hash the file again.
+            self.save(path, entry['profiler'], settings, fingerprint)
+            return CacheLookup('hit', entry['profiler'], old_size, fingerprint)
+        if prefix_digest == old_digest and self.__ends_with_newline(path, old_size):
+            return CacheLookup('append', entry['profiler'], old_size, fingerprint)
+        return CacheLookup('miss', None, 0, fingerprint)
+
+    def save(self, path: str, profiler, settings: tuple = (), fingerprint: tuple = None) -> None:
+        """
+        Store the profile of a file.
+        :param path: File profiled.
+        :param profiler: ChunkProfiler with all the rows of the file.
+        :param settings: Options used to build the profile.
+        :param fingerprint: (size, mtime, digest) if already known (see load).
+        :return: None.
+        """
+        if fingerprint is None:
+            stat = os.stat(path)
+            fingerprint = (stat.st_size, stat.st_mtime_ns, _file_digest(path)[0])
+        entry = {'path': os.path.abspath(path), 'settings': settings, 'fingerprint': fingerprint,
+                 'profiler': profiler}
+        # Write and rename so an interrupted run does not leave a broken entry.
+        entry_path = self.__entry_path(path)
+        with open(entry_path + '.tmp', 'wb') as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(entry_path + '.tmp', entry_path)
+
+    @staticmethod
+    def __ends_with_newline(path: str, size: int) -> bool:
+        """
+        Check the old content ended with a complete row (otherwise the last row was changed).
+        :param path: File.
+        :param size: Size of the old content.
+        :return: True if the byte before size is a new line.
+        """
+        if size == 0:
+            return False
+        with open(path, 'rb') as file:
+            file.seek(size - 1)
+            return file.read(1) == b'\n'
@@ -0,0 +1,288 @@
+"""
+    sketches
+    Memory-bounded helpers for DfInitCheck: 64-bit row hashes for duplicates and
+    HyperLogLog for approximate distinct counts.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+import numpy as np
+import pandas as pd
+
+# Changes when hash_rows/hash_values give other hashes: hashes saved before (profile cache) cannot be mixed with new ones.
+HASH_VERSION = 2
+# Key of a missing value in a numeric column (all the NaN bit patterns and pd.NA).
+_NAN_KEY = pd.util.hash_array(np.array([np.nan]))[0]
+
+
+def _numeric_key(values: pd.Series) -> np.ndarray:
+    """
+    One uint64 per value of a numeric column, equal for equal numbers whatever the dtype: an int64 column of one
+    chunk becomes float64 in the next one when a NaN appears, and 1 must match 1.0.
+    Integers (and floats with an integral value that fits in 64 bits) are kept exactly as their 64-bit value, so
+    big IDs (above 2 ** 53) never collide. Other floats use the hash of their bits (-0.0 is 0, an integer).
+    :param values: Numeric Series.
+    :return: uint64 array.
+    """
+    if pd.api.types.is_integer_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        # Nullable integers (Int64...) can have missing values: they get the key of NaN.
+        dtype = 'uint64' if pd.api.types.is_unsigned_integer_dtype(values.dtype) else 'int64'
+        keys = values.to_numpy(dtype=dtype, na_value=0).view('uint64')
+        if values.hasnans:
+            keys[values.isna().to_numpy()] = _NAN_KEY
+        return keys
+    floats = values.to_numpy(dtype='float64', na_value=np.nan)
+    keys = pd.util.hash_array(floats)
+    with np.errstate(invalid='ignore'):
+        integral = np.isfinite(floats) & (floats == np.floor(floats))
+        signed = integral & (floats >= -2.0 ** 63) & (floats < 2.0 ** 63)
+        unsigned = integral & (floats >= 2.0 ** 63) & (floats < 2.0 ** 64)
+    keys[signed] = floats[signed].astype('int64').view('uint64')
+    keys[unsigned] = floats[unsigned].astype('uint64')
+    keys[np.isnan(floats)] = _NAN_KEY
+    return keys
+
+
+def _normalize(values):
+    """
+    Numeric columns replaced by their _numeric_key, so the hash does not depend on the dtype.
+    :param values: DataFrame or Series.
+    :return: Same type, numeric columns converted.
+    """
+    if isinstance(values, pd.Series):
+        if not _is_number(values.dtype):
+            return values
+        return pd.Series(_numeric_key(values), index=values.index, name=values.name)
+    if not any(_is_number(dtype) for dtype in values.dtypes):
+        return values
+    values = values.copy(deep=False)
+    for position, dtype in enumerate(values.dtypes):
+        if _is_number(dtype):
+            values.isetitem(position, _numeric_key(values.iloc[:, position]))
+    return values
+
+
+def _is_number(dtype) -> bool:
+    """
+    Integer, unsigned, bool or float column (complex and other numeric types are hashed as they are).
+    :param dtype: Column dtype.
+    :return: bool.
+    """
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_complex_dtype(dtype)
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """
+    One 64-bit hash per row (the index is ignored). Numeric values hash the same whatever their dtype.
+    :param df: DataFrame to hash.
+    :return: uint64 array with len(df) items.
+    """
+    return pd.util.hash_pandas_object(_normalize(df), index=False).to_numpy()
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """
+    One 64-bit hash per non-null value of a column. Numeric values hash the same whatever their dtype.
+    :param series: Column to hash.
+    :return: uint64 array.
+    """
+    return pd.util.hash_pandas_object(_normalize(series.dropna()), index=False).to_numpy()
+
+
+def _leading_zeros(values: np.ndarray) -> np.ndarray:
+    """
+    Number of leading zero bits of each uint64 (binary search, no float conversion).
+    :param values: uint64 array.
+    :return: uint8 array (64 for 0).
+    """
+    zeros = np.zeros(values.shape, dtype=np.uint8)
+    shifted = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        # The top "shift" bits are all zero.
+        mask = shifted < (np.uint64(1) << np.uint64(64 - shift))
+        zeros[mask] += shift
+        shifted[mask] <<= np.uint64(shift)
+    zeros[values == 0] = 64
+    return zeros
+
+
+class RowHashSet:
+    """
+        Set of 64-bit row hashes to count duplicated rows chunk by chunk.
+        Uses 8 bytes per distinct row (sorted NumPy arrays) instead of the full rows.
+        Exact unless two different rows share the same 64-bit hash.
+        The hashes are kept in a few sorted runs (biggest first) instead of one array: a new chunk is a new run,
+        and runs of similar size are merged. Each hash is merged O(log n) times, np.insert into one big array would
+        copy all the hashes for every chunk (quadratic on big files).
+    """
+    def __init__(self):
+        self.__runs = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.__runs)
+
+    def add(self, hashes: np.ndarray) -> int:
+        """
+        Add the hashes of a new chunk.
+        :param hashes: uint64 array (see hash_rows).
+        :return: Number of rows that were already seen (same as DataFrame.duplicated().sum()).
+        """
+        unique = np.unique(hashes)
+        duplicated = len(hashes) - len(unique)
+        return duplicated + self.__insert(unique)
+
+    def first_seen(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Add the hashes of a new chunk and flag the rows to keep when dropping duplicates.
+        :param hashes: uint64 array (see hash_rows).
+        :return: Boolean array, True for the first time a row is seen (same as ~DataFrame.duplicated()).
+        """
+        unique, first_index = np.unique(hashes, return_index=True)
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first_index[~self.__contains(unique)]] = True
+        self.__insert(unique)
+        return mask
+
+    def merge(self, other: 'RowHashSet') -> int:
+        """
+        Add all the hashes of another set (i.e. built from other chunks).
+        :param other: RowHashSet.
+        :return: Number of hashes of other that were already in this set.
+        """
+        if not other.__runs:
+            return 0
+        return self.__insert(np.sort(np.concatenate(other.__runs)))
+
+    def __contains(self, unique: np.ndarray) -> np.ndarray:
+        """
+        Flag the hashes already in the set.
+        :param unique: uint64 array.
+        :return: Boolean array.
+        """
+        found = np.zeros(len(unique), dtype=bool)
+        for run in self.__runs:
+            positions = np.minimum(np.searchsorted(run, unique), len(run) - 1)
+            found |= run[positions] == unique
+        return found
+
+    def __insert(self, unique: np.ndarray) -> int:
+        """
+        Insert sorted unique hashes.
+        :param unique: Sorted uint64 array without repetitions.
+        :return: Number of them already present.
+        """
+        found = self.__contains(unique)
+        new = unique[~found]
+        if len(new):
+            self.__runs.append(new)  # Boolean indexing: new owns its data (no view of a bigger array).
+            # Merge while the last run is at least half the size of the previous one (runs never share hashes).
+            while len(self.__runs) > 1 and 2 * len(self.__runs[-1]) >= len(self.__runs[-2]):
+                last = self.__runs.pop()
+                self.__runs[-1] = np.sort(np.concatenate([self.__runs[-1], last]), kind='stable')
+        return int(found.sum())
+
+
+class HyperLogLog:
+    """
+        Approximate distinct counter with fixed memory (2 ** precision bytes).
+        Standard error is about 1.04 / sqrt(2 ** precision): ~0.8% with the default 14.
+    """
+    def __init__(self, precision: int = 14):
+        assert 4 <= precision <= 18, '+-- ERROR: HyperLogLog precision must be between 4 and 18.'
+        self.precision = precision
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray) -> None:
+        """
+        Add 64-bit hashes (see hash_values).
+        :param hashes: uint64 array.
+        :return: None.
+        """
+        if not len(hashes):
+            return
+        bits = np.uint64(self.precision)
+        # First bits choose the register, the rest give the rank (position of the first 1).
+        index = (hashes >> (np.uint64(64) - bits)).astype(np.intp)
+        rank = np.minimum(_leading_zeros(hashes << bits) + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        """
+        Merge another sketch (same precision) into this one.
+        :param other: HyperLogLog.
+        :return: None.
+        """
+        assert self.precision == other.precision, '+-- ERROR: Cannot merge HyperLogLog of different precision.'
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """
+        Estimated number of distinct values added.
+        :return: Estimation.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting).
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class RowReservoir:
+    """
+        Uniform random sample of size rows from a stream of chunks.
+        Every row gets a random key and the rows with the smallest keys are kept (same as reservoir sampling).
+    """
+    def __init__(self, size: int, seed: int = None):
+        self.size = size
+        self.rows_seen = 0
+        self.sample = None
+        self.__keys = np.empty(0)
+        self.__rng = np.random.default_rng(seed)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """
+        Offer the rows of a new chunk to the sample.
+        :param chunk: DataFrame.
+        :return: None.
+        """
+        self.rows_seen += len(chunk)
+        keys = self.__rng.random(len(chunk))
+        if self.sample is not None and len(self.sample) >= self.size:
+            # Only rows with a key below the current largest one can enter the sample.
+            candidates = keys < self.__keys.max()
+            chunk, keys = chunk[candidates], keys[candidates]
+            if not len(chunk):
+                return
+        sample = chunk if self.sample is None else pd.concat([self.sample, chunk])
+        keys = np.concatenate([self.__keys, keys])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            sample, keys = sample.iloc[keep], keys[keep]
+        self.sample, self.__keys = sample, keys
+
+
+class HashSample:
+    """
+        Keeps the size smallest distinct row hashes and how many times each one was seen.
+        All the copies of a row are in or out of the sample together, so the duplicate rate can be estimated.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, hashes: np.ndarray) -> None:
+        """
+        Add the row hashes of a new chunk.
+        :param hashes: uint64 array (see hash_rows).
+        :return: None.
+        """
+        if len(self.hashes) >= self.size:
+            hashes = hashes[hashes <= self.hashes[-1]]
+        unique, counts = np.unique(np.concatenate([self.hashes, hashes]), return_counts=True)
+        # Counts of the hashes already kept are carried over (they appear once in self.hashes).
+        old = np.isin(unique, self.hashes, assume_unique=True)
+        counts[old] += self.counts - 1
+        self.hashes, self.counts = unique[:self.size], counts[:self.size]
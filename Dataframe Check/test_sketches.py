@@ -0,0 +1,47 @@
+"""
+    Description:
+        Tests of the row hashes used to find duplicates (sketches.py), through DfInitCheck and CleaningPlan.
+        Run: python -m unittest test_sketches (from this folder).
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+# IMPORT ===============
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from cleaning import CleaningPlan
+from dataframecheck import DfInitCheck
+from sketches import hash_rows
+
+
+class RowHashTest(unittest.TestCase):
+
+    def test_big_ids_are_not_duplicates(self):
+        # Integers above 2 ** 53 cannot be told apart as float64.
+        df = pd.DataFrame({'id': [2 ** 53, 2 ** 53 + 1, 2 ** 60, 2 ** 60 + 1], 'v': 1})
+        self.assertEqual(df.duplicated().sum(), 0)
+        self.assertEqual(DfInitCheck.profile(df, duplicates='hash').duplicated, 0)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'ids.csv')
+            df.to_csv(path, index=False)
+            self.assertEqual(DfInitCheck.profile_csv(path, chunk_size=2).duplicated, 0)
+
+    def test_drop_duplicates_keeps_big_ids(self):
+        df = pd.DataFrame({'user': [1234567890123456789, 1234567890123456788, 1234567890123456787], 'x': 'a'})
+        clean, report = CleaningPlan().drop_duplicates().apply(df)
+        self.assertEqual(len(clean), 3)
+
+    def test_same_number_any_dtype(self):
+        # The same values as int64 (one chunk) and float64 with a NaN (next chunk).
+        ints = pd.DataFrame({'a': [1, 0, 2 ** 60]})
+        floats = pd.DataFrame({'a': [1.0, -0.0, float(2 ** 60), np.nan]})
+        self.assertTrue((hash_rows(ints) == hash_rows(floats)[:3]).all())
+        self.assertNotEqual(hash_rows(pd.DataFrame({'a': [1.5]}))[0], hash_rows(pd.DataFrame({'a': [1]}))[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
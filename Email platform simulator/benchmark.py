@@ -0,0 +1,118 @@
+"""
+    benchmark
+    Memory used by each message of a mailbox: Inbox (one Email object per message) and CompactInbox (arrays).
+    The 'dict' case is the baseline: Inbox with the previous Email (instance __dict__ and two bools).
+    The memory is measured with tracemalloc: the mailbox and its sender addresses are counted, the bodies are not
+    (they are shared by all the cases).
+    Example:
+        python benchmark.py --messages 100000 1000000
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from compact_inbox import CompactInbox
+from email import Email
+from inbox import Inbox
+
+
+class DictEmail:
+    """
+    Email as it was before __slots__ and the flags int (for the baseline): read and spam status are two bools in
+    the instance __dict__.
+    """
+    def __init__(self, sender_address: str, email_body: str = ''):
+        self.from_address = sender_address
+        self.email_contents = email_body
+        self.__has_been_read = False
+        self.__is_spam = False
+        self.inbox = None
+        self.id = None
+
+    def mark_as_read(self):
+        self.__has_been_read = True
+        if self.inbox is not None:
+            self.inbox.status_changed(self)
+
+    def mark_as_spam(self):
+        self.__is_spam = True
+        if self.inbox is not None:
+            self.inbox.status_changed(self)
+
+    def check_read_status(self):
+        return self.__has_been_read
+
+    def check_spam_status(self):
+        return self.__is_spam
+
+
+# CONSTANTS ===============
+# Name: (mailbox class, email class).
+MAILBOXES = {'dict': (Inbox, DictEmail), 'inbox': (Inbox, Email), 'compact': (CompactInbox, Email)}
+DEFAULT_MESSAGES = [10_000, 100_000, 1_000_000]
+# Different senders in the synthetic mailbox (a real mailbox gets most emails from a few addresses).
+SENDERS = 1_000
+BODIES = ['Hello you! I am a message.', 'More things.\n Already said.', 'You won a prize! Send your bank details.']
+# Fraction of the messages read and marked as spam.
+READ_RATIO = 0.5
+SPAM_RATIO = 0.1
+
+
+def make_messages(messages: int, seed: int = 0) -> list:
+    """
+    Synthetic messages. The bodies are shared, the senders are numbers (see run_case).
+    :param messages: Number of messages.
+    :param seed: Random seed (the same seed gives the same messages).
+    :return: List of (sender_number, email_body, read, spam).
+    """
+    rng = random.Random(seed)
+    return [(rng.randrange(SENDERS), rng.choice(BODIES),
+             rng.random() < READ_RATIO, rng.random() < SPAM_RATIO) for _ in range(messages)]
+
+
+def run_case(mailbox: str, messages: list) -> dict:
+    """
+    Fill one mailbox and measure it.
+    :param mailbox: One of MAILBOXES.
+    :param messages: Messages from make_messages.
+    :return: Dictionary with the results.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    mailbox_class, email_class = MAILBOXES[mailbox]
+    inbox = mailbox_class()
+    for sender_number, email_body, read, spam in messages:
+        # A new string for every message, as if it was read from a file or the network.
+        email = email_class(f'user{sender_number}@mail.com', email_body)
+        inbox.add(email)
+        if read:
+            email.mark_as_read()
+        if spam:
+            email.mark_as_spam()
+        del email
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(inbox) == len(messages)
+    return {'mailbox': mailbox, 'messages': len(messages), 'bytes_per_message': size / len(messages),
+            'seconds': seconds, 'unread': inbox.unread_count, 'spam': inbox.spam_count}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory used by each message of a mailbox.')
+    parser.add_argument('--messages', nargs='+', type=int, default=DEFAULT_MESSAGES, help='Messages per mailbox.')
+    parser.add_argument('--mailboxes', nargs='+', choices=list(MAILBOXES), default=list(MAILBOXES))
+    args = parser.parse_args()
+
+    print(f'+- {"mailbox":<8} {"messages":>10} {"bytes/message":>14} {"seconds":>8}')
+    for count in args.messages:
+        data = make_messages(count)
+        for name in args.mailboxes:
+            result = run_case(name, data)
+            print(f'+ {result["mailbox"]:<9} {result["messages"]:>10} {result["bytes_per_message"]:>14.1f} '
+                  f'{result["seconds"]:>8.2f}')
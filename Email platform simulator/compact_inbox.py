@@ -0,0 +1,172 @@
+"""
+    compact_inbox
+    CompactInbox class: same use as Inbox, with the emails kept in arrays instead of one Email object each.
+    For mailboxes with millions of emails (see benchmark.py).
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+from array import array
+from bisect import insort
+
+from email import READ, SPAM, Email
+
+# Bit of the flags of a deleted email (tombstone).
+DELETED = 4
+
+
+class CompactInbox:
+    """
+    Emails in order of arrival, the ID of an email is its position in the arrays:
+        - sender: number of the address in a list of different addresses (each address is stored once).
+        - body: list of strings.
+        - flags: one byte per email (READ | SPAM | DELETED).
+    The IDs of the unread and spam emails are also kept in two arrays (4 bytes per ID), so their lists do not check
+    every email. An ID is left in its array when the email is read or deleted and removed the next time the list is
+    asked for.
+    The Email objects are created when they are asked for (get, iteration, lists); marking them as read or spam
+    updates the arrays. Deleting an email frees its body and keeps the ID used (the IDs never change).
+    """
+    def __init__(self, emails: list = ()):
+        self.__addresses = []
+        # Address: number in self.__addresses.
+        self.__address_numbers = {}
+        self.__senders = array('I')
+        self.__bodies = []
+        self.__flags = bytearray()
+        self.__tombstones = 0
+        self.__unread = 0
+        self.__spam = 0
+        # IDs of the unread and spam emails, sorted (in inbox order).
+        self.__unread_ids = array('I')
+        self.__spam_ids = array('I')
+        for email in emails:
+            self.add(email)
+
+    def __len__(self) -> int:
+        return len(self.__flags) - self.__tombstones
+
+    def __contains__(self, email_id: int) -> bool:
+        return 0 <= email_id < len(self.__flags) and not self.__flags[email_id] & DELETED
+
+    def __iter__(self):
+        return (self.__view(email_id) for email_id, flags in enumerate(self.__flags) if not flags & DELETED)
+
+    @property
+    def unread_count(self) -> int:
+        return self.__unread
+
+    @property
+    def spam_count(self) -> int:
+        return self.__spam
+
+    @property
+    def tombstones(self) -> int:
+        return self.__tombstones
+
+    def add(self, email: Email) -> int:
+        """
+        Add an email at the end of the inbox. The email given is linked to the inbox (like the ones from get).
+        :param email: Email (not in another inbox).
+        :return: ID of the email.
+        """
+        assert email.inbox is None, '+-- ERROR: The email is already in an inbox.'
+        number = self.__address_numbers.get(email.from_address)
+        if number is None:
+            number = self.__address_numbers[email.from_address] = len(self.__addresses)
+            self.__addresses.append(email.from_address)
+        email.inbox = self
+        email.id = len(self.__flags)
+        self.__senders.append(number)
+        self.__bodies.append(email.email_contents)
+        self.__flags.append(email.flags)
+        self.__count(email.flags, 1)
+        if not email.flags & READ:
+            self.__unread_ids.append(email.id)
+        if email.flags & SPAM:
+            self.__spam_ids.append(email.id)
+        return email.id
+
+    def get(self, email_id: int):
+        """
+        Email with an ID.
+        :param email_id: ID of the email.
+        :return: Email, None if there is no email with that ID (i.e. deleted).
+        """
+        return self.__view(email_id) if email_id in self else None
+
+    def delete(self, email_id: int) -> Email:
+        """
+        Delete an email. The other emails keep their ID.
+        :param email_id: ID of the email.
+        :return: Email deleted (None if there is no email with that ID).
+        """
+        if email_id not in self:
+            return None
+        email = self.__view(email_id)
+        email.inbox = None
+        self.__count(self.__flags[email_id], -1)
+        self.__flags[email_id] |= DELETED
+        self.__bodies[email_id] = None
+        self.__tombstones += 1
+        return email
+
+    def unread_emails(self) -> list:
+        """
+        Unread emails, in inbox order.
+        :return: List of emails.
+        """
+        if len(self.__unread_ids) > self.__unread:
+            self.__unread_ids = array('I', (email_id for email_id in self.__unread_ids
+                                            if not self.__flags[email_id] & (READ | DELETED)))
+        return [self.__view(email_id) for email_id in self.__unread_ids]
+
+    def spam_emails(self) -> list:
+        """
+        Spam emails, in inbox order.
+        :return: List of emails.
+        """
+        if len(self.__spam_ids) > self.__spam:
+            self.__spam_ids = array('I', (email_id for email_id in self.__spam_ids
+                                          if not self.__flags[email_id] & DELETED))
+        return [self.__view(email_id) for email_id in self.__spam_ids]
+
+    def status_changed(self, email: Email) -> None:
+        """
+        Save the flags of an email after a change (called by Email).
+        :param email: Email of this inbox.
+        :return: None.
+        """
+        old_flags = self.__flags[email.id]
+        if old_flags & DELETED:
+            return
+        # Read and spam are never removed: another Email of the same ID can have older flags.
+        new_flags = old_flags | email.flags
+        self.__count(old_flags, -1)
+        self.__count(new_flags, 1)
+        self.__flags[email.id] = new_flags
+        if new_flags & SPAM and not old_flags & SPAM:
+            # Older emails can be marked after newer ones: insert in place to keep the IDs sorted.
+            insort(self.__spam_ids, email.id)
+
+    def __view(self, email_id: int) -> Email:
+        """
+        New Email object for an email of the arrays.
+        :param email_id: ID of the email (not deleted).
+        :return: Email linked to this inbox.
+        """
+        email = Email(self.__addresses[self.__senders[email_id]], self.__bodies[email_id], self.__flags[email_id])
+        email.inbox = self
+        email.id = email_id
+        return email
+
+    def __count(self, flags: int, change: int) -> None:
+        """
+        Update the unread/spam counters for an email.
+        :param flags: Flags of the email.
+        :param change: 1 (email added) or -1 (email removed).
+        :return: None.
+        """
+        if not flags & READ:
+            self.__unread += change
+        if flags & SPAM:
+            self.__spam += change
@@ -4,27 +4,45 @@
     :copyright: (c) 2022 Juan Carcedo, All rights reserved
     :licence: MIT, see LICENSE.txt for further details.
 """
+# Bits of Email.flags.
+READ = 1
+SPAM = 2
 
 
 class Email:
-    def __init__(self, sender_address: str, email_body: str = ''):
+    # No __dict__ per email: a mailbox can keep millions of them.
+    __slots__ = ('from_address', 'email_contents', '__flags', 'inbox', 'id')
+
+    def __init__(self, sender_address: str, email_body: str = '', flags: int = 0):
         self.from_address = sender_address
         self.email_contents = email_body
-        # Set the following private variables to False.
-        # User cannot directly access them.
-        self.__has_been_read = False
-        self.__is_spam = False
+        # Read and spam status packed in one private int (READ | SPAM).
+        # User cannot directly access it.
+        self.__flags = flags
+        # Inbox of the email and ID in it (set by Inbox.add). The inbox is told about the changes.
+        self.inbox = None
+        self.id = None
+
+    @property
+    def flags(self) -> int:
+        return self.__flags
 
     def mark_as_read(self):
-        self.__has_been_read = True
+        if not self.__flags & READ:
+            self.__flags |= READ
+            if self.inbox is not None:
+                self.inbox.status_changed(self)
 
     def mark_as_spam(self):
-        self.__is_spam = True
+        if not self.__flags & SPAM:
+            self.__flags |= SPAM
+            if self.inbox is not None:
+                self.inbox.status_changed(self)
 
     def check_read_status(self):
         # Retrieve the status of read.
-        return self.__has_been_read
+        return bool(self.__flags & READ)
 
     def check_spam_status(self):
         # Retrieve the status of spam.
-        return self.__is_spam
+        return bool(self.__flags & SPAM)
@@ -0,0 +1,151 @@
+"""
+    inbox
+    Inbox class: emails with a stable ID that keeps the unread/spam counters and lists up to date.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+from bisect import bisect_left
+
+from email import Email
+
+# Deleted slots (tombstones) allowed in the list of emails before it is compacted (fraction of the list).
+COMPACT_RATIO = 0.25
+
+
+class Inbox:
+    """
+    Emails in order of arrival. Every email gets an ID (0, 1, 2...) that does not change when other emails are
+    deleted. Deleting leaves an empty slot (tombstone) in the list instead of moving the next emails; the list is
+    compacted when the empty slots are more than COMPACT_RATIO of it.
+    The unread and spam emails are kept apart, updated when an email is added, deleted, read or marked as spam,
+    so the counters do not need to check all the emails.
+    """
+    def __init__(self, emails: list = (), compact_ratio: float = COMPACT_RATIO):
+        self.compact_ratio = compact_ratio
+        # Emails in order of arrival, None for deleted ones (tombstones).
+        self.__slots = []
+        self.__tombstones = 0
+        # ID: position in self.__slots.
+        self.__positions = {}
+        self.__next_id = 0
+        # Dictionary used as an ordered set (Email: None).
+        self.__unread = {}
+        # IDs of the spam emails, sorted (IDs are given in order of arrival).
+        self.__spam_ids = []
+        for email in emails:
+            self.add(email)
+
+    def __len__(self) -> int:
+        return len(self.__positions)
+
+    def __contains__(self, email_id: int) -> bool:
+        return email_id in self.__positions
+
+    def __iter__(self):
+        return (email for email in self.__slots if email is not None)
+
+    @property
+    def unread_count(self) -> int:
+        return len(self.__unread)
+
+    @property
+    def spam_count(self) -> int:
+        return len(self.__spam_ids)
+
+    @property
+    def tombstones(self) -> int:
+        return self.__tombstones
+
+    def add(self, email: Email) -> int:
+        """
+        Add an email at the end of the inbox.
+        :param email: Email (not in another inbox).
+        :return: ID of the email.
+        """
+        assert email.inbox is None, '+-- ERROR: The email is already in an inbox.'
+        email.inbox = self
+        email.id = self.__next_id
+        self.__next_id += 1
+        self.__positions[email.id] = len(self.__slots)
+        self.__slots.append(email)
+        self.status_changed(email)
+        return email.id
+
+    def get(self, email_id: int):
+        """
+        Email with an ID.
+        :param email_id: ID of the email.
+        :return: Email, None if there is no email with that ID (i.e. deleted).
+        """
+        position = self.__positions.get(email_id)
+        return None if position is None else self.__slots[position]
+
+    def delete(self, email_id: int) -> Email:
+        """
+        Delete an email. The other emails keep their ID.
+        :param email_id: ID of the email.
+        :return: Email deleted (None if there is no email with that ID).
+        """
+        position = self.__positions.pop(email_id, None)
+        if position is None:
+            return None
+        email = self.__slots[position]
+        self.__slots[position] = None
+        self.__tombstones += 1
+        self.__unread.pop(email, None)
+        self.__unmark_spam(email_id)
+        email.inbox = None
+        if self.__tombstones > self.compact_ratio * len(self.__slots):
+            self.compact()
+        return email
+
+    def compact(self) -> None:
+        """
+        Remove the empty slots of the deleted emails (the IDs do not change).
+        :return: None.
+        """
+        self.__slots = [email for email in self.__slots if email is not None]
+        self.__positions = {email.id: position for position, email in enumerate(self.__slots)}
+        self.__tombstones = 0
+
+    def unread_emails(self) -> list:
+        """
+        Unread emails, in inbox order.
+        :return: List of emails.
+        """
+        # An email can only go from unread to read: the order of arrival is kept.
+        return list(self.__unread)
+
+    def spam_emails(self) -> list:
+        """
+        Spam emails, in inbox order.
+        :return: List of emails.
+        """
+        return [self.get(email_id) for email_id in self.__spam_ids]
+
+    def status_changed(self, email: Email) -> None:
+        """
+        Update the unread/spam lists after a change of an email (called by Email).
+        :param email: Email of this inbox.
+        :return: None.
+        """
+        if email.check_read_status():
+            self.__unread.pop(email, None)
+        else:
+            self.__unread[email] = None
+        if not email.check_spam_status():
+            self.__unmark_spam(email.id)
+            return
+        position = bisect_left(self.__spam_ids, email.id)
+        if position == len(self.__spam_ids) or self.__spam_ids[position] != email.id:
+            self.__spam_ids.insert(position, email.id)
+
+    def __unmark_spam(self, email_id: int) -> None:
+        """
+        Remove an ID from the spam list (if it is there).
+        :param email_id: ID of the email.
+        :return: None.
+        """
+        position = bisect_left(self.__spam_ids, email_id)
+        if position < len(self.__spam_ids) and self.__spam_ids[position] == email_id:
+            del self.__spam_ids[position]
@@ -21,6 +21,7 @@
 """
 # imports ====
 from email import Email
+from inbox import Inbox
 
 # CONSTANTS ====
 MENU = '''+ (0) \tadd item to inbox
@@ -53,22 +54,22 @@ def add_email(content: str, sender: str) -> Email:
     return email
 
 
-def delete_email(email_number: int = 0) -> None:
+def delete_email(email_id: int = 0) -> None:
     """
     Delete an email.
-    :param email_number: Position/index in the inbox list of the email.
+    :param email_id: ID of the email (it does not change when other emails are deleted).
     :return: None
     """
-    # Check if the index is available (it can also be done with try-except and/or assert).
-    if email_number >= len(inbox):
-        print(f'This email does not exists. Please select an email between 0 and {len(inbox) - 1}.')
+    # Check if the email exists.
+    email_to_delete = inbox.get(email_id)
+    if email_to_delete is None:
+        print(f'This email does not exists. Please select the ID of an email in the inbox.')
 
     else:
-        # Gather email and ask for confirmation before deleting.
-        email_to_delete = inbox[email_number]
+        # Ask for confirmation before deleting.
         print(f'+-- Email from {email_to_delete.from_address} will be deleted.')
         if input('+- Please confirm (Y/N): ').lower() == 'y':
-            inbox.pop(email_number)
+            inbox.delete(email_id)
             print('+- Email deleted ------+')
         else:
             print('+- Deletion aborted ------+')
@@ -82,19 +83,19 @@ def get_count() -> int:
     return len(inbox)
 
 
-def get_email(email_number: int = 0) -> None:
+def get_email(email_id: int = 0) -> None:
     """
     Read an email in the inbox, print it and mark it as read.
-    :param email_number: Position/index in the inbox list of the email.
+    :param email_id: ID of the email.
     :return: None
     """
-    # Check if the index is available (it can also be done with try-except).
-    if email_number >= len(inbox):
-        print(f'This email does not exists. Please select an email between 0 and {len(inbox) - 1}.')
+    # Check if the email exists.
+    email_to_read = inbox.get(email_id)
+    if email_to_read is None:
+        print(f'This email does not exists. Please select the ID of an email in the inbox.')
 
     else:
         # Set email to read = True.
-        email_to_read = inbox[email_number]
         email_to_read.mark_as_read()
         print(f'+-- Email from {email_to_read.from_address}:')
         print(email_to_read.email_contents)
@@ -121,20 +122,21 @@ def send_email() -> bool:
     return False
 
 
-def mark_as_spam(email_number: int = 0) -> None:
+def mark_as_spam(email_id: int = 0) -> None:
     """
     Mark an email as spam.
-    :param email_number: Position/index in the inbox list of the email.
+    :param email_id: ID of the email.
     :return: None
     """
-    # Check if the index is available (it can also be done with try-except).
-    if email_number >= len(inbox):
-        print(f'This email does not exists. Please select an email between 0 and {len(inbox) - 1}.')
+    # Check if the email exists.
+    email_to_mark = inbox.get(email_id)
+    if email_to_mark is None:
+        print(f'This email does not exists. Please select the ID of an email in the inbox.')
 
     else:
         # Set email to spam = True.
-        inbox[email_number].mark_as_spam()
-        print(f'+-- Email from {inbox[email_number].from_address} marked as spam.')
+        email_to_mark.mark_as_spam()
+        print(f'+-- Email from {email_to_mark.from_address} marked as spam.')
 
 
 def count_unread_emails_and_spam() -> list:
@@ -142,14 +144,8 @@ def count_unread_emails_and_spam() -> list:
     Count the number of unread emails and spam emails currently in the inbox.
     :return: Number of unread emails, Number of spam emails in a list.
     """
-    unread, spam = 0, 0
-    for i in range(len(inbox)):
-        # Add 1 to the unread number if has_been_read is False.
-        unread += 1 if not inbox[i].check_read_status() else 0
-        # Add 1 to the spam number if it is marked as spam.
-        spam += 1 if inbox[i].check_spam_status() else 0
-
-    return [unread, spam]
+    # The inbox keeps the counters up to date: no need to check every email.
+    return [inbox.unread_count, inbox.spam_count]
 
 
 def get_unread_emails() -> list:
@@ -157,13 +153,7 @@ def get_unread_emails() -> list:
     Generate a list (print) of all unread emails.
     :return: List of unread emails.
     """
-    unread_list = []
-    for i in range(len(inbox)):
-        # If it is unread, retrieve the email.
-        if not inbox[i].check_read_status():
-            unread_list.append(inbox[i])
-
-    return unread_list
+    return inbox.unread_emails()
 
 
 def get_spam_emails() -> list:
@@ -171,18 +161,12 @@ def get_spam_emails() -> list:
     Generate a list (print) of all spam emails.
     :return: List of spam emails.
     """
-    spam_list = []
-    for i in range(len(inbox)):
-        # If it is spam, retrieve the email.
-        if inbox[i].check_spam_status():
-            spam_list.append(inbox[i])
-
-    return spam_list
+    return inbox.spam_emails()
 
 
 if __name__ == '__main__':
     print('+----------------- Email Platform -----------------+')
-    inbox = INITIAL_INBOX
+    inbox = Inbox(INITIAL_INBOX)
 
     user_choice = -1
 
@@ -206,7 +190,7 @@ if __name__ == '__main__':
             if user_choice == 2:  # Read
                 try:
                     # try-except to prevent issues whilst using cast into int.
-                    email_selected = int(input('\n+ Select the email you want to read (number): '))
+                    email_selected = int(input('\n+ Select the email you want to read (ID): '))
                     assert email_selected >= 0, 'Please input a positive number.'
 
                 except ValueError:
@@ -222,7 +206,7 @@ if __name__ == '__main__':
             elif user_choice == 4:  # Mark Spam
                 try:
                     # try-except to prevent issues whilst using cast into int.
-                    email_selected = int(input('\n+ Select the email you want to mark as spam (number): '))
+                    email_selected = int(input('\n+ Select the email you want to mark as spam (ID): '))
                     assert email_selected >= 0, 'Please input a positive number.'
 
                 except ValueError:
@@ -241,7 +225,7 @@ if __name__ == '__main__':
             elif user_choice == 6:  # Delete
                 try:
                     # try-except to prevent issues whilst using cast into int.
-                    email_selected = int(input('\n+ Select the email you want to delete (number): '))
+                    email_selected = int(input('\n+ Select the email you want to delete (ID): '))
                     assert email_selected >= 0, 'Please input a positive number.'
 
                 except ValueError:
@@ -261,7 +245,7 @@ if __name__ == '__main__':
                 else:
                     email_body = input('+- Write message:\n\t')
                     # Add the email to the inbox
-                    inbox.append(add_email(content=email_body, sender=from_who))
+                    inbox.add(add_email(content=email_body, sender=from_who))
                     print('+- Email added ------+')
 
             elif user_choice == 1:  # Show unread
@@ -273,7 +257,7 @@ if __name__ == '__main__':
                 else:
                     print('+- Unread emails:')
                     for i in range(len(unread_emails)):
-                        print(f'+ Email position {inbox.index(unread_emails[i])} from {unread_emails[i].from_address}.')
+                        print(f'+ Email ID {unread_emails[i].id} from {unread_emails[i].from_address}.')
                     print('+- Use "read" option to read any of the emails above.')
 
             elif user_choice == 5:  # Show spam
@@ -285,7 +269,7 @@ if __name__ == '__main__':
                 else:
                     print('+- Spam emails:')
                     for i in range(len(spam_emails)):
-                        print(f'+ Email position {inbox.index(spam_emails[i])} from {spam_emails[i].from_address}.')
+                        print(f'+ Email ID {spam_emails[i].id} from {spam_emails[i].from_address}.')
                     print('+- Use "read" option to read any of the emails above.')
 
             elif user_choice == 99:
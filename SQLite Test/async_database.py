@@ -0,0 +1,153 @@
+"""
+    Description:
+        asyncio front end for the database: the queries run in a thread pool (over DataBasePool),
+        so the event loop is never blocked. Reads run in parallel, writes one at a time.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+# IMPORT ===============
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from database_pool import DEFAULT_READERS, DEFAULT_TIMEOUT, DataBasePool
+
+# CONSTANTS ===============
+# Rows fetched from the database at once by stream.
+STREAM_BATCH_SIZE = 1000
+
+
+class AsyncDataBase:
+    """
+    Async access to one database file:
+        async with AsyncDataBase('data/student_db') as db:
+            rows = await db.fetch('SELECT * FROM python_programming WHERE grade > ?', (60,))
+            async for row in db.stream('SELECT * FROM python_programming'):
+                ...
+            await db.execute('UPDATE python_programming SET grade = ? WHERE id = ?', (65, 55))
+    At most `readers` reads and one write run at the same time. The other calls wait (without blocking the
+    event loop) for their turn, so a burst of requests does not pile up work in the threads.
+    """
+
+    def __init__(self, path_to_db: str = 'abort', readers: int = DEFAULT_READERS, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Constructor of the class. Note: path to db is required.
+        :param path_to_db: Database file (WAL mode is set, see DataBasePool).
+        :param readers: Number of reads running at the same time (reader connections).
+        :param timeout: Seconds to wait for a database lock.
+        """
+        self.__pool = DataBasePool(path_to_db, readers, timeout)
+        # One thread per reader plus one for the writer: a read never waits for a free thread.
+        self.__executor = ThreadPoolExecutor(max_workers=readers + 1, thread_name_prefix='database')
+        # Bounded concurrency: a slot per reader connection, one writer at a time.
+        self.__reader_slots = asyncio.Semaphore(readers)
+        self.__writer_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> 'AsyncDataBase':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def __run(self, function, *args):
+        """
+        Run a blocking function in the thread pool.
+        :param function: Function to run.
+        :param args: Its arguments.
+        :return: Result of the function.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+    async def fetch(self, sql_code: str, params=()) -> list:
+        """
+        Execute some code to GATHER records from the db (with a reader connection).
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders (? or :name) of sql_code.
+        :return: Database reply --> Note this is a list!
+        """
+        async with self.__reader_slots:
+            return await self.__run(self.__pool.gather_records, sql_code, params)
+
+    async def stream(self, sql_code: str, params=(), batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Execute some code to GATHER records and return them as they are fetched (for big replies):
+            async for row in db.stream(sql_code):
+        The next batch is fetched while the current one is used, never more: a slow consumer slows the reads.
+        The reader connection is kept until the end of the loop (use contextlib.aclosing if the loop can break).
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders of sql_code.
+        :param batch_size: Rows fetched from the database at once.
+        :return: Async generator of rows (tuples).
+        """
+        loop = asyncio.get_running_loop()
+        async with self.__reader_slots:
+            # In the thread pool: a cancelled stream gives its connection back from a callback of the loop,
+            # so the slot can be free before the connection is (waiting here would block that callback).
+            pending = loop.run_in_executor(self.__executor, self.__pool.acquire_reader)
+            try:
+                connection = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                pending.add_done_callback(self.__release_acquired)
+                raise
+            cursor = connection.cursor()
+            # Work running in the thread pool: the cursor cannot be closed before it ends.
+            pending = loop.run_in_executor(self.__executor, cursor.execute, sql_code, params)
+            try:
+                await asyncio.shield(pending)
+                pending = loop.run_in_executor(self.__executor, cursor.fetchmany, batch_size)
+                while True:
+                    rows = await asyncio.shield(pending)
+                    if not rows:
+                        break
+                    # Read ahead one batch while the consumer uses this one.
+                    pending = loop.run_in_executor(self.__executor, cursor.fetchmany, batch_size)
+                    for row in rows:
+                        yield row
+            finally:
+                def release(_=None):
+                    cursor.close()
+                    self.__pool.release_reader(connection)
+
+                if pending.done():
+                    release()
+                else:
+                    # Cancelled or closed while the thread is still fetching.
+                    pending.add_done_callback(release)
+
+    def __release_acquired(self, pending) -> None:
+        """
+        Give back the reader connection of an acquire_reader that ended after its stream was cancelled.
+        :param pending: Future of acquire_reader.
+        :return: None.
+        """
+        if not pending.cancelled() and pending.exception() is None:
+            self.__pool.release_reader(pending.result())
+
+    async def execute(self, sql_code: str, params=()) -> int:
+        """
+        UPDATE records in the db (INSERT, UPDATE, DELETE...), committed at the end. Writes run one at a time.
+        Errors are raised (and the write rolled back).
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders of sql_code.
+        :return: Number of rows changed.
+        """
+        async with self.__writer_lock:
+            return await self.__run(self.__pool.update_database, sql_code, params)
+
+    async def insert_records(self, data, table_name: str) -> int:
+        """
+        Insert multiple records in one transaction (see DataBasePool.insert_records).
+        :param data: List of tuples, one value per column of the table.
+        :param table_name: Name of table for inserting.
+        :return: Number of rows inserted.
+        """
+        async with self.__writer_lock:
+            return await self.__run(self.__pool.insert_records, data, table_name)
+
+    async def close(self) -> None:
+        """
+        Wait for the work running and close all the connections.
+        :return: None.
+        """
+        async with self.__writer_lock:
+            await asyncio.get_running_loop().run_in_executor(None, self.__executor.shutdown)
+            self.__pool.end_connection()
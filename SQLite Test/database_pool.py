@@ -0,0 +1,155 @@
+"""
+    Description:
+        Thread-safe variant of DataBase: one writer connection and N reader connections.
+        The database uses WAL journaling, so readers do not wait for the writer (or for each other).
+        Writes are serialized on the writer connection.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+# IMPORT ===============
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# CONSTANTS ===============
+DEFAULT_READERS = 4
+# Seconds to wait for a free reader (or for a lock in the database) before failing.
+DEFAULT_TIMEOUT = 30.0
+
+
+class DataBasePool:
+    """
+    Pool of connections to one database file, safe to share between threads.
+    Use the context managers to get a connection:
+        with pool.reader() as connection: ...   (any number of threads at the same time)
+        with pool.writer() as connection: ...   (one thread at a time, commit at the end, rollback on error)
+    """
+
+    def __init__(self, path_to_db: str = 'abort', readers: int = DEFAULT_READERS, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Constructor of the class. Note: path to db is required.
+        :param path_to_db: Database file (':memory:' is not allowed, every connection would get its own db).
+        :param readers: Number of reader connections.
+        :param timeout: Seconds to wait for a reader or a database lock.
+        """
+        assert path_to_db != 'abort', '+-- ERROR: Path to database is required for connection, process aborted.'
+        assert path_to_db != ':memory:', '+-- ERROR: A pool cannot share an in-memory database, use a file.'
+        assert readers > 0, '+-- ERROR: At least one reader connection is required.'
+        self.path_to_db = path_to_db
+        self.timeout = timeout
+        # Writer: opened first to switch the database to WAL (the setting is kept in the file).
+        self.__writer = sqlite3.connect(path_to_db, timeout=timeout, check_same_thread=False)
+        self.__writer.execute('PRAGMA journal_mode=WAL')
+        self.__writer_lock = threading.Lock()
+        # Readers: a queue works as the pool (get = take a connection, put = give it back).
+        self.__readers = queue.Queue()
+        for _ in range(readers):
+            connection = sqlite3.connect(path_to_db, timeout=timeout, check_same_thread=False)
+            connection.execute('PRAGMA query_only=ON')  # Readers must never write.
+            self.__readers.put(connection)
+        self.__all_readers = list(self.__readers.queue)
+        # Reader in use by each thread, so nested reader() calls do not take a second connection.
+        self.__local = threading.local()
+
+    @contextmanager
+    def reader(self):
+        """
+        Borrow a reader connection. The same thread gets the same connection in nested calls.
+        :return: sqlite3.Connection (context manager).
+        """
+        connection = getattr(self.__local, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        connection = self.acquire_reader()
+        self.__local.connection = connection
+        try:
+            yield connection
+        finally:
+            self.__local.connection = None
+            self.release_reader(connection)
+
+    def acquire_reader(self) -> sqlite3.Connection:
+        """
+        Take a reader connection until release_reader is called (it can be used from other threads, one at a
+        time). Prefer reader(), this is for code that cannot use a with block (i.e. async generators).
+        :return: sqlite3.Connection.
+        """
+        try:
+            return self.__readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError('+-- ERROR: No reader connection available.') from None
+
+    def release_reader(self, connection: sqlite3.Connection) -> None:
+        """
+        Give back a connection taken with acquire_reader.
+        :param connection: Reader connection.
+        :return: None.
+        """
+        self.__readers.put(connection)
+
+    @contextmanager
+    def writer(self):
+        """
+        Get the writer connection (one thread at a time). Commit at the end, rollback if there is an error.
+        :return: sqlite3.Connection (context manager).
+        """
+        with self.__writer_lock:
+            try:
+                yield self.__writer
+            except Exception:
+                self.__writer.rollback()
+                raise
+            else:
+                self.__writer.commit()
+
+    def gather_records(self, sql_code: str, params=()) -> list:
+        """
+        Execute some code to GATHER records from the db with a reader connection.
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders (?) of sql_code.
+        :return: Database reply --> Note this is a list!
+        """
+        with self.reader() as connection:
+            return connection.execute(sql_code, params).fetchall()
+
+    def update_database(self, sql_code: str, params=()) -> int:
+        """
+        UPDATE records in the db with the writer connection (committed at the end).
+        Errors are raised (not printed) as this is used from several threads.
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders (?) of sql_code.
+        :return: Number of rows changed.
+        """
+        with self.writer() as connection:
+            return connection.execute(sql_code, params).rowcount
+
+    def insert_records(self, data, table_name: str) -> int:
+        """
+        Insert multiple records in one transaction with the writer connection.
+        :param data: List (or any iterable) of tuples, one value per column of the table.
+        :param table_name: Name of table for inserting.
+        :return: Number of rows inserted.
+        """
+        data = iter(data)
+        first = next(data, None)
+        if first is None:
+            return 0
+        placeholders = ','.join('?' * len(first))
+        with self.writer() as connection:
+            cursor = connection.execute(f'INSERT INTO {table_name} VALUES ({placeholders})', first)
+            inserted = cursor.rowcount
+            inserted += connection.executemany(f'INSERT INTO {table_name} VALUES ({placeholders})', data).rowcount
+        return inserted
+
+    def end_connection(self) -> None:
+        """
+        Close all the connections.
+        :return: None.
+        """
+        print('+- Closing database pool connections.')
+        with self.__writer_lock:
+            self.__writer.close()
+        for connection in self.__all_readers:
+            connection.close()
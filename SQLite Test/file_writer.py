@@ -0,0 +1,137 @@
+"""
+    Description:
+        Writer of the database file for the in-memory mirror of DataBase (enable_memory_mirror):
+        the writes committed in memory are applied to the file, at once or by a background thread.
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+# IMPORT ===============
+import queue
+import sqlite3
+import threading
+
+# CONSTANTS ===============
+# Seconds to wait for a lock in the database file before failing.
+DEFAULT_TIMEOUT = 30.0
+# Max transactions applied by the background thread in one commit of the file.
+MAX_GROUPED_TRANSACTIONS = 100
+
+
+class FileWriter:
+    """
+    Applies transactions to the database file. A transaction is a list of (sql_code, params, many, failed):
+    the statements as they were run in memory (failed: it raised an error there, so the same error is expected).
+    background=False: apply() returns when the file is committed.
+    background=True: apply() only queues the transaction, a thread commits the queued ones together.
+    """
+
+    def __init__(self, path_to_db: str, background: bool = False, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Constructor of the class.
+        :param path_to_db: Database file.
+        :param background: Use a background thread.
+        :param timeout: Seconds to wait for a lock in the file.
+        """
+        self.background = background
+        # Statements the file refused but the memory accepted: memory and file are not the same any more.
+        self.errors = []
+        self.transactions = 0
+        self.__db = sqlite3.connect(path_to_db, timeout=timeout, check_same_thread=False)
+        self.__queue = queue.Queue()
+        self.__thread = None
+        if background:
+            self.__thread = threading.Thread(target=self.__run, name='database-file-writer', daemon=True)
+            self.__thread.start()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection to the file. Call flush before using it.
+        :return: sqlite3.Connection.
+        """
+        return self.__db
+
+    def apply(self, statements: list) -> None:
+        """
+        Apply one committed transaction to the file.
+        :param statements: List of (sql_code, params, many, failed).
+        :return: None.
+        """
+        if self.background:
+            self.__queue.put(statements)
+        else:
+            self.__apply([statements])
+
+    def pending(self) -> int:
+        """
+        Transactions queued and not yet in the file (always 0 without background thread).
+        :return: Number of transactions.
+        """
+        return self.__queue.unfinished_tasks
+
+    def flush(self) -> None:
+        """
+        Wait until all the queued transactions are in the file.
+        :return: None.
+        """
+        if self.background:
+            self.__queue.join()
+
+    def close(self) -> None:
+        """
+        Write the queued transactions and close the file.
+        :return: None.
+        """
+        if self.__thread is not None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__thread = None
+        self.__db.close()
+
+    def __run(self) -> None:
+        """
+        Background thread: take the queued transactions and commit them to the file in groups.
+        :return: None.
+        """
+        while True:
+            transactions = [self.__queue.get()]
+            while transactions[-1] is not None and len(transactions) < MAX_GROUPED_TRANSACTIONS:
+                try:
+                    transactions.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = transactions[-1] is None
+            if stop:
+                transactions.pop()
+            try:
+                if transactions:
+                    self.__apply(transactions)
+            finally:
+                for _ in range(len(transactions) + stop):
+                    self.__queue.task_done()
+            if stop:
+                return
+
+    def __apply(self, transactions: list) -> None:
+        """
+        Run the statements of some transactions in the file and commit them once.
+        :param transactions: List of transactions.
+        :return: None.
+        """
+        # One explicit transaction in the file: the BEGIN of each transaction in memory is skipped.
+        if not self.__db.in_transaction:
+            self.__db.execute('BEGIN')
+        for statements in transactions:
+            for sql_code, params, many, failed in statements:
+                if sql_code.strip().upper().startswith('BEGIN'):
+                    continue
+                try:
+                    if many:
+                        self.__db.executemany(sql_code, params)
+                    else:
+                        self.__db.execute(sql_code, params)
+                except sqlite3.Error as error:
+                    if not failed:
+                        self.errors.append((sql_code, str(error)))
+        self.__db.commit()
+        self.transactions += len(transactions)
@@ -6,11 +6,57 @@
     :licence: MIT, see LICENSE.txt for further details.
 """
 # IMPORT ===============
+import hashlib
+import json
+import math
+import os
+import re
 import sqlite3
+import sys
+import time
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from tabulate import tabulate  # Pretty tables
 
+from file_writer import FileWriter
+
 # CONSTANTS ===============
 DATABASE_PATH = 'data/student_db'
+# Prepared statements kept by the connection (LRU). Our code uses a few dozen different statements.
+STATEMENT_CACHE_SIZE = 128
+# Result cache (enable_result_cache): max replies kept and max memory used.
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_MB = 64
+# SQL functions that can give a different reply every time: SELECTs using them are not cached.
+VOLATILE_FUNCTIONS = {'random', 'randomblob', 'changes', 'total_changes', 'last_insert_rowid', 'date', 'time',
+                      'datetime', 'julianday', 'unixepoch', 'strftime', 'timediff', 'current_date', 'current_time',
+                      'current_timestamp'}
+# Same names in a DEFAULT of a column (i.e. DEFAULT CURRENT_TIMESTAMP): the memory mirror cannot write that table.
+VOLATILE_DEFAULT = re.compile(r'\b(?:' + '|'.join(sorted(VOLATILE_FUNCTIONS)) + r')\b', re.IGNORECASE)
+# Query stats (enable_query_stats): executions kept per statement for the percentiles.
+STATS_SAMPLES = 1000
+# Statements slower than this (ms) get their EXPLAIN QUERY PLAN recorded.
+SLOW_QUERY_MS = 100
+# Snapshots: pages copied per step, pause between steps (ms) and snapshots kept by rotate_snapshot.
+SNAPSHOT_PAGES = 256
+SNAPSHOT_SLEEP_MS = 5
+SNAPSHOT_KEEP = 5
+# A write by another connection makes the copy start again: after this many restarts it is done in one step.
+SNAPSHOT_MAX_RESTARTS = 3
+# Backup step status when another connection holds a lock (SQLITE_BUSY, SQLITE_LOCKED): nothing was copied.
+SNAPSHOT_BUSY_STATUS = (5, 6)
+# Rows printed per page by show_all_data.
+SHOW_PAGE_SIZE = 100
+# Rows fetched from the database at once when streaming records.
+FETCH_BATCH_SIZE = 1000
+# Rows inserted per executemany call by bulk_insert.
+BULK_BATCH_SIZE = 10_000
+# PRAGMAs used by bulk_insert(fast_pragmas=True). Faster, but a crash during the load can corrupt the db.
+BULK_PRAGMAS = {'synchronous': 'OFF', 'journal_mode': 'MEMORY', 'cache_size': '-262144'}  # cache: 256 MB
 
 # Note the list contains tuples: (id, name, grade).
 STUDENTS_HEADER = ['id', 'name', 'grade']
@@ -22,38 +68,268 @@ STUDENTS = [
     (2, 'Lucas Brooke', 99),
 ]
 
+# Tables read and written by a statement. cacheable: its reply can be kept by the result cache.
+# replicate: the memory mirror must run it in the file too (writes and BEGIN/SAVEPOINT/RELEASE/ROLLBACK TO).
+StatementAccess = namedtuple('StatementAccess', ['read', 'written', 'cacheable', 'replicate'])
+# Reply kept by the result cache: rows, ((table, version), ...) when it was read, bytes used.
+CachedResult = namedtuple('CachedResult', ['rows', 'versions', 'size'])
+
+
+def _statement_access(events: list) -> StatementAccess:
+    """
+    Classify a statement from the authorizer calls made when it was prepared.
+    :param events: List of (action, arg1, arg2) (see sqlite3.Connection.set_authorizer).
+    :return: StatementAccess. Without events (BEGIN, SAVEPOINT...) nothing is read or written and it is not cacheable.
+    """
+    read, written = set(), set()
+    cacheable = bool(events)
+    for action, arg1, arg2 in events:
+        if action == sqlite3.SQLITE_READ:
+            if arg1:
+                read.add(arg1.lower())
+        elif action == sqlite3.SQLITE_FUNCTION:
+            if arg2.lower() in VOLATILE_FUNCTIONS:
+                cacheable = False
+        elif action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_RECURSIVE):
+            pass
+        elif action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+                        sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_CREATE_TEMP_TABLE,
+                        sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_TEMP_TABLE):
+            written.add(arg1.lower())
+            cacheable = False
+        elif action == sqlite3.SQLITE_ALTER_TABLE:
+            written.add(arg2.lower())
+            cacheable = False
+        else:
+            # PRAGMA, ATTACH, CREATE INDEX...
+            cacheable = False
+    return StatementAccess(frozenset(read), frozenset(written), cacheable, bool(written) or not events)
+
+
+@lru_cache(maxsize=1024)
+def _normalize_sql(sql_code: str) -> str:
+    """
+    SQL code without the values, so the same statement with other values is grouped together.
+    :param sql_code: SQL code.
+    :return: Code in one line, with '?' instead of strings and numbers (and IN lists as IN (?)).
+    """
+    sql_code = re.sub(r"'(?:[^']|'')*'", '?', sql_code)
+    sql_code = re.sub(r'(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', '?', sql_code, flags=re.IGNORECASE)
+    sql_code = re.sub(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', 'IN (?)', sql_code, flags=re.IGNORECASE)
+    return ' '.join(sql_code.split())
+
+
+def _percentile(values: list, percent: float) -> float:
+    """
+    Nearest-rank percentile.
+    :param values: Sorted list of numbers (not empty).
+    :param percent: 0 to 100.
+    :return: Value.
+    """
+    return values[max(0, min(len(values) - 1, math.ceil(percent * len(values) / 100) - 1))]
+
+
+def _rows_size(rows: list) -> int:
+    """
+    Approximate memory used by a reply (list of tuples).
+    :param rows: Reply of the database.
+    :return: Bytes.
+    """
+    return sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row)) for row in rows)
+
+
+def _new_column(declared_type: str, values: tuple):
+    """
+    Empty container for a column of fetch_columns, from the declared type of the column
+    (affinity rules of SQLite) or, for expressions, from the first value that is not NULL.
+    :param declared_type: Type in CREATE TABLE ('' if not known).
+    :param values: First values of the column.
+    :return: array('q') for integers, array('d') for reals, list for text/blob/others.
+    """
+    declared_type = (declared_type or '').upper()
+    if not declared_type:
+        value = next((value for value in values if value is not None), None)
+        declared_type = {int: 'INT', float: 'REAL'}.get(type(value), 'TEXT')
+    if 'INT' in declared_type:
+        return array('q')
+    if any(name in declared_type for name in ('CHAR', 'CLOB', 'TEXT', 'BLOB')):
+        return []
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')):
+        return array('d')
+    return []
+
+
+def _extend_column(column, values: tuple):
+    """
+    Add values to a column of fetch_columns. SQLite does not enforce the types, so the column changes
+    to a wider type if needed: NULL or a real in an integer column -> reals (NULL = NaN), text -> list.
+    :param column: array or list.
+    :param values: Values of one batch.
+    :return: The column (a new one if it had to change).
+    """
+    if isinstance(column, list):
+        column.extend(values)
+        return column
+    numbers = values
+    if None in values:
+        numbers = [math.nan if value is None else value for value in values]
+        if column.typecode == 'q':
+            column = array('d', column)
+    try:
+        # fromlist leaves the array unchanged if a value has a wrong type.
+        column.fromlist(list(numbers))
+        return column
+    except TypeError:
+        pass
+    if column.typecode == 'q':
+        try:
+            column = array('d', column)
+            column.fromlist(list(numbers))
+            return column
+        except TypeError:
+            pass
+    column = column.tolist()
+    column.extend(values)
+    return column
+
 
 class DataBase:
     """
     Class to handle all items required with iterations with DB.
     """
 
-    def __init__(self, path_to_db: str = 'abort'):
+    def __init__(self, path_to_db: str = 'abort', statement_cache_size: int = STATEMENT_CACHE_SIZE):
         """
         Constructor of the class. Note: path to db is required.
         :param path_to_db: File to be created.
+        :param statement_cache_size: Number of prepared statements kept (LRU). The same SQL code with other
+         parameters reuses its prepared statement.
         """
         assert path_to_db != 'abort', '+-- ERROR: Path to database is required for connection, process aborted.'
         # Define private variables. The class will handle internally each request.
-        # Connection to the db.
-        self.__db = sqlite3.connect(path_to_db)
+        # Connection to the db. sqlite3 keeps the prepared statements, keyed by the SQL code.
+        self.__path_to_db = path_to_db
+        self.__db = sqlite3.connect(path_to_db, cached_statements=statement_cache_size)
         self.__cursor = self.__db.cursor()
+        # Same LRU as the connection (SQL code only) to count the hits and misses.
+        self.__statements = OrderedDict()
+        self.__statement_cache_size = statement_cache_size
+        self.__statement_hits = 0
+        self.__statement_misses = 0
+        # Result cache: OrderedDict (LRU) when enabled, None when disabled.
+        self.__result_cache = None
+        self.__result_cache_limits = (RESULT_CACHE_ENTRIES, RESULT_CACHE_MB * 1024 * 1024)
+        self.__result_cache_bytes = 0
+        self.__result_hits = 0
+        self.__result_misses = 0
+        # Version of each table, +1 on every write. Cached replies of an older version are not used.
+        self.__table_versions = {}
+        # Authorizer calls of the statement being executed (only with the result cache or the memory mirror).
+        self.__access = None
+        # Why the authorizer refused the statement being prepared (memory mirror only), None if it did not.
+        self.__denied = None
+        # Memory mirror: FileWriter of the file when enabled (self.__db is then the copy in memory).
+        self.__file_writer = None
+        # Statements to run in the file at the next commit, and the report of the initial copy.
+        self.__mirror_log = []
+        # Tables with a DEFAULT that changes every time (their INSERTs are refused with the mirror).
+        self.__volatile_defaults = frozenset()
+        self.__mirror_report = {}
+        # Query stats: {normalized SQL: {'count', 'seconds', 'rows', 'samples'}} when enabled, None when disabled.
+        self.__query_stats = None
+        self.__slow_queries = {}
+        self.__slow_query_ms = SLOW_QUERY_MS
+        # Writes are committed at the end of the outermost transaction() block.
+        self.__transaction_depth = 0
+        # Group commit: (max statements, max seconds) or None. Pending writes since the last commit.
+        self.__group_commit = None
+        self.__pending_writes = 0
+        self.__first_pending = 0.0
 
-    def show_all_data(self, table_name: str) -> None:
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection to the database (i.e. for pandas.read_sql or DfInitCheck.check_sql).
+        :return: sqlite3.Connection.
+        """
+        return self.__db
+
+    def show_all_data(self, table_name: str, page_size: int = SHOW_PAGE_SIZE, max_pages: int = None,
+                      file=None) -> None:
         """
         Print all data in db. SELECT * FROM table_name.
+        The rows are read and printed page by page (the first page is shown at once, whatever the size of
+        the table). Headers are the names of the columns.
         :param table_name: Name of the table.
+        :param page_size: Rows per page.
+        :param max_pages: Stop after this number of pages (None: all the table).
+        :param file: Where to print (default: sys.stdout).
         :return: None.
         """
-        # Select all records in the db.
-        sql = f'''
-                SELECT *
-                FROM {table_name}
-            '''
-        # Using tabulate to pretty print.
-        print(f'+----- Contents of table "{table_name}":-------+')
-        print(tabulate(self.gather_records(sql), headers=STUDENTS_HEADER))
-        print('+-----------------------------------------------+\n')
+        file = sys.stdout if file is None else file
+        file.write(f'+----- Contents of table "{table_name}":-------+\n')
+        pages = self.__table_pages(table_name, page_size)
+        try:
+            for number, (headers, rows) in enumerate(pages, start=1):
+                if number > 1 and not rows:
+                    # The last page was full, nothing more to show.
+                    break
+                # One write per page, flushed so the page is seen before the next one is read.
+                text = tabulate(rows, headers=headers) + '\n'
+                if number > 1:
+                    text = f'+- Page {number}:\n' + text
+                if max_pages is not None and number >= max_pages and len(rows) == page_size:
+                    text += f'+- Stopped after {number} pages of {page_size} rows.\n'
+                    file.write(text)
+                    break
+                file.write(text)
+                file.flush()
+        finally:
+            pages.close()
+        file.write('+-----------------------------------------------+\n\n')
+        file.flush()
+
+    def __table_pages(self, table_name: str, page_size: int):
+        """
+        Read a table page by page. Keyset pagination on rowid (each page starts where the last one ended,
+        no OFFSET to skip), or LIMIT/OFFSET for tables without rowid.
+        Each page is read with gather_records, so the pages are kept by the result cache (if enabled),
+        with the bounds of the page in the key.
+        :param table_name: Name of the table.
+        :param page_size: Rows per page.
+        :return: Generator of (headers, rows). At least one page, maybe empty.
+        """
+        headers = [column[0] for column in self.__execute(f'SELECT * FROM {table_name} LIMIT 0').description]
+        # Views have no usable rowid (it is NULL).
+        keyset = not self.__execute('SELECT 1 FROM sqlite_master WHERE type = ? AND name = ? UNION ALL '
+                                    'SELECT 1 FROM sqlite_temp_master WHERE type = ? AND name = ?',
+                                    ('view', table_name, 'view', table_name)).fetchone()
+        keyset_sql = f'SELECT rowid, * FROM {table_name} WHERE rowid > ? ORDER BY rowid LIMIT ?'
+        offset_sql = f'SELECT * FROM {table_name} LIMIT ? OFFSET ?'
+        rows = None
+        if keyset:
+            try:
+                rows = self.gather_records(keyset_sql, (-2 ** 63, page_size))
+            except sqlite3.OperationalError as error:
+                if 'rowid' not in str(error):
+                    raise
+                # WITHOUT ROWID table.
+                keyset = False
+        if not keyset:
+            rows = self.gather_records(offset_sql, (page_size, 0))
+        read = 0
+        while True:
+            read += len(rows)
+            if keyset:
+                last_rowid = rows[-1][0] if rows else None
+                rows = [row[1:] for row in rows]
+            yield headers, rows
+            if len(rows) < page_size:
+                break
+            if keyset:
+                rows = self.gather_records(keyset_sql, (last_rowid, page_size))
+            else:
+                rows = self.gather_records(offset_sql, (page_size, read))
 
     def create_table(self, sql_code: str) -> None:
         """
@@ -66,8 +342,9 @@ class DataBase:
         try:
             # try-except block to prevent issues if the table is already there.
             # Get data into db and commit the change:
-            self.__cursor.execute(sql_code)
-            self.__db.commit()
+            with self.__write_scope():
+                self.__execute(sql_code)
+            self.__commit()
 
         except sqlite3.OperationalError as error:
             # Catch the error if the table already exists.
@@ -77,7 +354,7 @@ class DataBase:
         except Exception as error:
             # Catch other errors.
             # Rollback any wrong changes.
-            self.__db.rollback()
+            self.__rollback(error)
             raise error
 
         else:
@@ -100,74 +377,982 @@ class DataBase:
         try:
             # try-except to catch issues whilst updating the db.
             # Insert all records of data into the db.
-            if method == 'multiple':
-                # Multiple member selection. Note is "hardcoded" for this structure of table.
-                # Probably in the future I will create something more dynamic.
-                self.__cursor.executemany(f'''INSERT INTO {table_name} VALUES (?,?,?)''', data)
-
-            else:
-                # Prepared but not yet implemented.
-                print('+- Single method not implemented.')
+            # One placeholder per column of the table.
+            sql = self.__insert_sql(table_name, self.table_columns(table_name))
+            if method not in ('single', 'multiple'):
+                print(f'+- Method "{method}" not available (use "single" or "multiple").')
                 return
 
+            with self.__write_scope():
+                if method == 'multiple':
+                    self.__execute(sql, data, many=True)
+                else:
+                    self.__execute(sql, data)
+
             # Save the changes
-            self.__db.commit()
+            self.__commit()
 
         except sqlite3.IntegrityError as error:
             print(f'+-- ERROR: {error}.')
             print(f'+- Process aborted.\n')
             # Rollback any changes.
-            self.__db.rollback()
+            self.__rollback(error)
 
         else:
             # Only if all was ok.
             print('+- New data inserted.\n')
 
-    def gather_records(self, sql_code: str) -> list:
+    def bulk_insert(self, data, table_name: str, batch_size: int = BULK_BATCH_SIZE,
+                    fast_pragmas: bool = False) -> dict:
+        """
+        Fast insert of many records in one transaction, in batches of batch_size rows (executemany).
+        If a batch breaks a constraint (IntegrityError) only that batch is retried row by row, the wrong rows
+        are skipped and the rest of the load goes on.
+        :param data: Any iterable of rows: list, generator, csv.reader... Rows can be tuples (one value per
+         column of the table) or dicts (column: value). A pandas DataFrame is inserted by column name.
+        :param table_name: Name of table for inserting.
+        :param batch_size: Rows per executemany call.
+        :param fast_pragmas: Use BULK_PRAGMAS during the load (restored at the end).
+        :return: Dictionary with rows inserted, rows rejected, seconds and rows per second.
+        """
+        columns = self.table_columns(table_name)
+        if hasattr(data, 'itertuples'):
+            # DataFrame: use its columns (they must exist in the table).
+            columns = [str(col) for col in data.columns]
+            data = data.itertuples(index=False, name=None)
+        sql = self.__insert_sql(table_name, columns)
+        print(f'+-- Bulk loading records into table "{table_name}".')
+
+        old_pragmas = {}
+        # Inside transaction() the load joins the open transaction (no PRAGMAs, no commit here).
+        own_transaction = not self.__transaction_depth
+        if own_transaction:
+            # PRAGMAs like journal_mode cannot change inside a transaction.
+            self.flush()
+            self.__commit_now()
+        elif fast_pragmas:
+            print('+- PRAGMAs ignored inside a transaction.')
+        if fast_pragmas and own_transaction:
+            for name, value in BULK_PRAGMAS.items():
+                old_pragmas[name] = self.__execute(f'PRAGMA {name}').fetchone()[0]
+                self.__execute(f'PRAGMA {name} = {value}')
+
+        report = {'inserted': 0, 'rejected': 0, 'failed_batches': 0}
+        start = time.perf_counter()
+        rows = iter(data)
+        try:
+            if own_transaction:
+                self.__execute('BEGIN')
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                if isinstance(batch[0], dict):
+                    batch = [tuple(row.get(column) for column in columns) for row in batch]
+                # Savepoint: an error only undoes this batch, not the whole transaction.
+                self.__execute('SAVEPOINT bulk_batch')
+                try:
+                    self.__execute(sql, batch, many=True)
+                    report['inserted'] += len(batch)
+                except sqlite3.IntegrityError:
+                    self.__execute('ROLLBACK TO bulk_batch')
+                    report['failed_batches'] += 1
+                    for row in batch:
+                        try:
+                            self.__execute(sql, row)
+                            report['inserted'] += 1
+                        except sqlite3.IntegrityError:
+                            report['rejected'] += 1
+                self.__execute('RELEASE bulk_batch')
+            if own_transaction:
+                self.__commit_now()
+
+        except Exception:
+            # Other errors (wrong table, wrong number of values...) undo the whole load.
+            if own_transaction:
+                self.__rollback_now()
+                self.__clear_result_cache()
+            raise
+
+        finally:
+            for name, value in old_pragmas.items():
+                self.__execute(f'PRAGMA {name} = {value}')
+
+        report['seconds'] = time.perf_counter() - start
+        report['rows_per_second'] = report['inserted'] / report['seconds'] if report['seconds'] else 0.0
+        print(f'+- {report["inserted"]} rows inserted ({report["rows_per_second"]:,.0f} rows/s), '
+              f'{report["rejected"]} rejected.\n')
+        return report
+
+    def table_columns(self, table_name: str) -> list:
+        """
+        Names of the columns of a table, in order.
+        :param table_name: Name of the table.
+        :return: List of column names (empty if the table does not exist).
+        """
+        self.__flush_due()
+        return [column[1] for column in self.__execute(f'PRAGMA table_info({table_name})').fetchall()]
+
+    @staticmethod
+    def __insert_sql(table_name: str, columns: list) -> str:
+        """
+        INSERT code with one placeholder per column.
+        :param table_name: Name of the table.
+        :param columns: Column names.
+        :return: SQL code.
+        """
+        names = ', '.join('"' + column.replace('"', '""') + '"' for column in columns)
+        return f'INSERT INTO {table_name} ({names}) VALUES ({", ".join("?" * len(columns))})'
+
+    def gather_records(self, sql_code: str, params=()) -> list:
         """
         Execute some code to GATHER records from the db, then return the reply from database.
-        :param sql_code: SQL code to execute.
+        Use iter_records for big replies (this one keeps all of them in memory).
+        :param sql_code: SQL code to execute. Use placeholders (? or :name) for the values, not f-strings.
+        :param params: Values for the placeholders (tuple or dict).
         :return: Database reply --> Note this is a list!
         """
-        self.__cursor.execute(sql_code)
-        # Return the reply from database.
-        return self.__cursor.fetchall()
+        self.__flush_due()
+        if self.__result_cache is None:
+            return list(self.iter_records(sql_code, params))
+        try:
+            # The type is part of the key: 1 and 1.0 are equal, but SELECT ? does not give the same reply.
+            values = sorted(params.items()) if isinstance(params, dict) else params
+            key = (sql_code, tuple((type(value), value) for value in values))
+            entry = self.__result_cache.get(key)
+        except TypeError:
+            # Values that cannot be a dictionary key (i.e. a list): not cached.
+            return list(self.iter_records(sql_code, params))
+
+        if entry is not None:
+            if all(self.__table_versions.get(table, 0) == version for table, version in entry.versions):
+                self.__result_cache.move_to_end(key)
+                self.__result_hits += 1
+                return list(entry.rows)
+            # A table changed after the reply was cached.
+            self.__drop_result(key)
+
+        self.__result_misses += 1
+        rows = list(self.iter_records(sql_code, params))
+        access = self.__statements.get(sql_code)
+        if access is not None and access.cacheable:
+            size = _rows_size(rows)
+            max_entries, max_bytes = self.__result_cache_limits
+            if size <= max_bytes:
+                versions = tuple((table, self.__table_versions.get(table, 0)) for table in access.read)
+                self.__result_cache[key] = CachedResult(tuple(rows), versions, size)
+                self.__result_cache_bytes += size
+                while len(self.__result_cache) > max_entries or self.__result_cache_bytes > max_bytes:
+                    self.__drop_result(next(iter(self.__result_cache)))
+        return rows
+
+    def iter_records(self, sql_code: str, params=(), batch_size: int = FETCH_BATCH_SIZE, batches: bool = False):
+        """
+        Execute some code to GATHER records from the db and return them as they are fetched (fetchmany),
+        so the memory used does not grow with the size of the reply.
+        :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders (tuple or dict).
+        :param batch_size: Rows fetched from the database at once.
+        :param batches: True to get lists of up to batch_size rows instead of single rows.
+        :return: Generator of rows (tuples) or of lists of rows.
+        """
+        self.__flush_due()
+        # Own cursor: other calls to the class during the iteration do not reset it.
+        cursor = self.__db.cursor()
+        # For the query stats: time spent in SQLite (not in the code using the rows) and rows returned.
+        seconds, returned = 0.0, 0
+        try:
+            start = time.perf_counter()
+            self.__execute(sql_code, params, cursor, record=False)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                seconds += time.perf_counter() - start
+                if not rows:
+                    break
+                returned += len(rows)
+                if batches:
+                    yield rows
+                else:
+                    yield from rows
+                start = time.perf_counter()
+        finally:
+            cursor.close()
+            if self.__query_stats is not None:
+                self.__record_query(sql_code, params, seconds, returned)
 
-    def update_database(self, sql_code: str) -> None:
+    def fetch_columns(self, sql_code: str, params=(), output: str = 'array', batch_size: int = FETCH_BATCH_SIZE):
         """
-        UPDATE records in the db, this means that records will be committed to db.
+        Execute some code to GATHER records and return them by column, for analysis. The rows are added to
+        one typed buffer per column batch by batch: the memory used is about the size of the columns (plus one
+        batch), not one tuple per row.
+        Types: the declared type of the column (columns of the table after FROM), otherwise the first value.
+        INTEGER -> int64 (float64 with NaN if there are NULLs), REAL -> float64, others -> objects.
         :param sql_code: SQL code to execute.
+        :param params: Values for the placeholders (tuple or dict).
+        :param output: 'array' (dict of array.array/list), 'numpy' (dict of NumPy arrays) or 'frame' (DataFrame).
+        :param batch_size: Rows fetched from the database at once.
+        :return: {column name: values} or pandas.DataFrame.
+        """
+        if output not in ('array', 'numpy', 'frame'):
+            raise ValueError(f'+-- ERROR: Output "{output}" not available (use "array", "numpy" or "frame").')
+        self.__flush_due()
+        # Declared types of the table after FROM (if any), by column name.
+        table = re.search(r'\bFROM\s+["`\[]?(\w+)', sql_code, flags=re.IGNORECASE)
+        declared = {}
+        if table is not None:
+            declared = {column[1].lower(): column[2] for column in
+                        self.__db.execute(f'PRAGMA table_info({table.group(1)})')}
+
+        cursor = self.__db.cursor()
+        try:
+            self.__execute(sql_code, params, cursor)
+            names = [column[0] for column in cursor.description or ()]
+            columns = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                batch = list(zip(*rows))
+                del rows
+                if columns is None:
+                    columns = [_new_column(declared.get(name.lower(), ''), values)
+                               for name, values in zip(names, batch)]
+                columns = [_extend_column(column, values) for column, values in zip(columns, batch)]
+        finally:
+            cursor.close()
+        if columns is None:
+            columns = [[] for _ in names]
+        result = dict(zip(names, columns))
+        if output == 'array':
+            return result
+
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('+-- ERROR: NumPy is required for output "numpy" or "frame" (pip install numpy).')
+        for name, column in result.items():
+            if isinstance(column, array):
+                # No copy: the NumPy array uses the buffer of the array.
+                result[name] = np.frombuffer(column, dtype=np.int64 if column.typecode == 'q' else np.float64)
+            else:
+                result[name] = np.array(column, dtype=object)
+        if output == 'numpy':
+            return result
+        import pandas as pd
+        return pd.DataFrame(result, copy=False)
+
+    def update_database(self, sql_code: str, params=()) -> None:
+        """
+        UPDATE records in the db, this means that records will be committed to db.
+        :param sql_code: SQL code to execute. Use placeholders (? or :name) for the values, not f-strings.
+        :param params: Values for the placeholders (tuple or dict).
         :return: None.
         """
         try:
             # try-except to catch issues whilst updating the db.
-            self.__cursor.execute(sql_code)
+            with self.__write_scope():
+                self.__execute(sql_code, params)
             # Save the changes
-            self.__db.commit()
+            self.__commit()
 
         except sqlite3.IntegrityError as error:
             print(f'+-- ERROR: {error}.')
             print(f'+- Process aborted.\n')
             # Rollback any changes.
-            self.__db.rollback()
+            self.__rollback(error)
 
         except Exception as error:
             # Catch all. Used to update the code based on the possible error.
             print(f'+-- ERROR: {error}.')
             print(f'+- Process aborted.\n')
             # Rollback any changes.
-            self.__db.rollback()
+            self.__rollback(error)
 
         else:
             # Only if all was ok.
             print('+- Data in database updated.\n')
 
+    def statement_cache_info(self) -> dict:
+        """
+        Use of the prepared statement cache. Many misses with a full cache: SQL code built with the values
+        inside (f-strings) or a cache too small (see statement_cache_size).
+        :return: Dictionary with hits, misses, hit_rate, size and max_size.
+        """
+        calls = self.__statement_hits + self.__statement_misses
+        return {'hits': self.__statement_hits, 'misses': self.__statement_misses,
+                'hit_rate': self.__statement_hits / calls if calls else 0.0,
+                'size': len(self.__statements), 'max_size': self.__statement_cache_size}
+
+    def enable_result_cache(self, max_entries: int = RESULT_CACHE_ENTRIES, max_mb: float = RESULT_CACHE_MB) -> None:
+        """
+        Keep the replies of gather_records in memory: the same SQL code with the same parameters is answered
+        without SQLite until one of the tables read is written.
+        Only the writes made through this DataBase are seen: do not use it if other connections or programs
+        write to the database.
+        :param max_entries: Max replies kept (the least recently used ones are dropped first).
+        :param max_mb: Max memory (MB) used by the replies kept.
+        :return: None.
+        """
+        if self.__result_cache is None:
+            self.__result_cache = OrderedDict()
+            self.__update_authorizer()
+        self.__result_cache_limits = (max_entries, max_mb * 1024 * 1024)
+
+    def disable_result_cache(self) -> None:
+        """
+        Drop the replies kept and stop caching.
+        :return: None.
+        """
+        if self.__result_cache is not None:
+            self.__result_cache = None
+            self.__result_cache_bytes = 0
+            self.__update_authorizer()
+
+    def result_cache_info(self) -> dict:
+        """
+        Use of the result cache.
+        :return: Dictionary with hits, misses, hit_rate, entries, mb (memory used) and table_versions.
+        """
+        calls = self.__result_hits + self.__result_misses
+        return {'hits': self.__result_hits, 'misses': self.__result_misses,
+                'hit_rate': self.__result_hits / calls if calls else 0.0,
+                'entries': len(self.__result_cache or ()), 'mb': self.__result_cache_bytes / 1024 / 1024,
+                'table_versions': dict(self.__table_versions)}
+
+    def __drop_result(self, key) -> None:
+        """
+        Remove one reply from the result cache.
+        :param key: (SQL code, parameters).
+        :return: None.
+        """
+        self.__result_cache_bytes -= self.__result_cache.pop(key).size
+
+    def __clear_result_cache(self) -> None:
+        """
+        Remove all the replies from the result cache (i.e. after a rollback).
+        :return: None.
+        """
+        if self.__result_cache:
+            self.__result_cache.clear()
+            self.__result_cache_bytes = 0
+
+    def __update_authorizer(self) -> None:
+        """
+        Install the authorizer if the result cache or the memory mirror need it, remove it otherwise.
+        :return: None.
+        """
+        # The authorizer tells which tables each statement reads or writes. Installing it makes SQLite
+        # prepare again all the statements, so it is called for every statement used from now on.
+        needed = self.__result_cache is not None or self.__file_writer is not None
+        self.__db.set_authorizer(self.__authorizer if needed else None)
+
+    def __authorizer(self, action: int, arg1, arg2, db_name, source) -> int:
+        """
+        Called by SQLite when a statement is prepared (see sqlite3.Connection.set_authorizer).
+        Only denies with the memory mirror, the writes that would not give the same rows in the file.
+        :return: sqlite3.SQLITE_OK or sqlite3.SQLITE_DENY.
+        """
+        # BEGIN/SAVEPOINT are skipped: sqlite3 runs a BEGIN before a write even if the write was prepared before.
+        if self.__access is not None and action not in (sqlite3.SQLITE_TRANSACTION, sqlite3.SQLITE_SAVEPOINT):
+            self.__access.append((action, arg1, arg2))
+            if self.__file_writer is not None:
+                self.__denied = self.__not_replicable(self.__access)
+                if self.__denied is not None:
+                    return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    def __not_replicable(self, events: list):
+        """
+        The file is written running the same SQL code again: a write with random(), dates or 'now' (or an INSERT
+        in a table with such a DEFAULT) would not write the same values as in memory.
+        :param events: Authorizer calls of the statement so far.
+        :return: Reason to refuse the statement, None if it can be replicated.
+        """
+        writes = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE)
+        written = [arg1 for action, arg1, _ in events if action in writes]
+        if not written:
+            return None
+        for action, arg1, _ in events:
+            if action == sqlite3.SQLITE_INSERT and arg1.lower() in self.__volatile_defaults:
+                return (f'Table "{arg1}" has a DEFAULT that changes every time, it cannot be written with the '
+                        f'memory mirror (disable it to write this table)')
+        volatile = [arg2 for action, _, arg2 in events
+                    if action == sqlite3.SQLITE_FUNCTION and arg2.lower() in VOLATILE_FUNCTIONS]
+        if volatile:
+            return (f'{volatile[0]}() changes every time, a write using it cannot be replicated by the memory '
+                    f'mirror (compute the value first and pass it as a parameter)')
+        return None
+
+    def __find_volatile_defaults(self) -> None:
+        """
+        Look for the tables with a DEFAULT that changes every time (see __not_replicable).
+        :return: None.
+        """
+        tables = set()
+        for (table,) in self.__db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            for column in self.__db.execute(f'PRAGMA table_info("{table}")').fetchall():
+                if column[4] is not None and VOLATILE_DEFAULT.search(column[4]):
+                    tables.add(table.lower())
+        self.__volatile_defaults = frozenset(tables)
+
+    def enable_query_stats(self, slow_query_ms: float = SLOW_QUERY_MS) -> None:
+        """
+        Start (again) to time every statement run by the DataBase, see query_stats.
+        :param slow_query_ms: Statements slower than this get their EXPLAIN QUERY PLAN recorded.
+        :return: None.
+        """
+        self.__query_stats = {}
+        self.__slow_queries = {}
+        self.__slow_query_ms = slow_query_ms
+
+    def disable_query_stats(self) -> None:
+        """
+        Stop timing the statements (the stats are dropped).
+        :return: None.
+        """
+        self.__query_stats = None
+        self.__slow_queries = {}
+
+    def query_stats(self) -> dict:
+        """
+        Time used by each statement since enable_query_stats, grouped by the SQL code without values.
+        Percentiles use the last STATS_SAMPLES executions. rows: rows returned (SELECT) or changed.
+        :return: Dictionary with 'statements' (slowest total first) and 'slow_queries' (with the query plan
+         and, if a table is fully scanned on a filtered column, a suggested index).
+        """
+        statements = []
+        for sql, stats in (self.__query_stats or {}).items():
+            samples = sorted(stats['samples'])
+            statements.append({'sql': sql, 'count': stats['count'], 'total_ms': stats['seconds'] * 1000,
+                               'p50_ms': _percentile(samples, 50) * 1000, 'p95_ms': _percentile(samples, 95) * 1000,
+                               'p99_ms': _percentile(samples, 99) * 1000, 'rows': stats['rows']})
+        statements.sort(key=lambda item: item['total_ms'], reverse=True)
+        slow = [{'sql': sql, **slow_query} for sql, slow_query in self.__slow_queries.items()]
+        return {'statements': statements, 'slow_queries': slow}
+
+    def dump_query_stats(self, path: str = None) -> str:
+        """
+        Query stats as JSON.
+        :param path: File to save them (optional).
+        :return: JSON text.
+        """
+        text = json.dumps(self.query_stats(), indent=2)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+        return text
+
+    def __record_query(self, sql_code: str, params, seconds: float, rows: int) -> None:
+        """
+        Add one execution to the query stats. Slow statements get their query plan recorded (once).
+        :param sql_code: SQL code executed.
+        :param params: Its parameters (None if not known, i.e. executemany): needed for the query plan.
+        :param seconds: Time used.
+        :param rows: Rows returned or changed.
+        :return: None.
+        """
+        sql = _normalize_sql(sql_code)
+        stats = self.__query_stats.get(sql)
+        if stats is None:
+            stats = self.__query_stats[sql] = {'count': 0, 'seconds': 0.0, 'rows': 0,
+                                               'samples': deque(maxlen=STATS_SAMPLES)}
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['rows'] += rows
+        stats['samples'].append(seconds)
+
+        if seconds * 1000 < self.__slow_query_ms:
+            return
+        slow_query = self.__slow_queries.get(sql)
+        if slow_query is None:
+            plan = None
+            if params is not None:
+                try:
+                    # Straight to the connection: not timed and not counted in the statement cache.
+                    plan = [row[3] for row in self.__db.execute(f'EXPLAIN QUERY PLAN {sql_code}', params)]
+                except sqlite3.Error:
+                    pass
+            slow_query = self.__slow_queries[sql] = {'count': 0, 'max_ms': 0.0, 'plan': plan,
+                                                     'suggested_index': self.__suggest_index(sql, plan)}
+        slow_query['count'] += 1
+        slow_query['max_ms'] = max(slow_query['max_ms'], seconds * 1000)
+
+    def __suggest_index(self, sql: str, plan: list):
+        """
+        Look for tables fully scanned (SCAN without an index) whose columns are used in the WHERE clause.
+        :param sql: Normalized SQL code.
+        :param plan: Details of EXPLAIN QUERY PLAN (or None).
+        :return: CREATE INDEX code (one per table, separated by ';'), or None.
+        """
+        where = re.search(r'\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bRETURNING\b|$)', sql,
+                          flags=re.IGNORECASE)
+        if not plan or where is None:
+            return None
+        where = where.group(1)
+        suggestions = []
+        for detail in plan:
+            scan = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+            if scan is None or 'INDEX' in detail:
+                continue
+            table = scan.group(1)
+            columns = [column[1] for column in self.__db.execute(f'PRAGMA table_info({table})')]
+            used = [column for column in columns if re.search(rf'\b{re.escape(column)}\b', where, re.IGNORECASE)]
+            if not used:
+                continue
+            # Columns compared with = first: the index can be used for all of them plus one range.
+            used.sort(key=lambda column: not re.search(rf'\b{re.escape(column)}\s*(?:=|IS\b|IN\b)', where,
+                                                       re.IGNORECASE))
+            suggestions.append(f'CREATE INDEX idx_{table}_{"_".join(used)} ON {table} ({", ".join(used)})')
+        return '; '.join(suggestions) or None
+
+    def __execute(self, sql_code: str, params=(), cursor: sqlite3.Cursor = None, many: bool = False,
+                  record: bool = True):
+        """
+        Execute code with its parameters and count the use of the statement cache.
+        With the result cache, the tables written get a new version.
+        :param sql_code: SQL code with placeholders.
+        :param params: Values for the placeholders (a list of them if many).
+        :param cursor: Cursor to use (default: the cursor of the class).
+        :param many: Use executemany.
+        :param record: Add it to the query stats (iter_records records the fetch time too).
+        :return: The cursor.
+        """
+        # Value: StatementAccess of the statement (None if not known).
+        if sql_code in self.__statements:
+            self.__statements.move_to_end(sql_code)
+            self.__statement_hits += 1
+        else:
+            self.__statement_misses += 1
+            self.__statements[sql_code] = None
+            if len(self.__statements) > self.__statement_cache_size:
+                self.__statements.popitem(last=False)
+        cursor = self.__cursor if cursor is None else cursor
+        if self.__result_cache is None and self.__query_stats is None and self.__file_writer is None:
+            return cursor.executemany(sql_code, params) if many else cursor.execute(sql_code, params)
+
+        if many and self.__file_writer is not None:
+            # The rows are needed twice: memory and file.
+            params = list(params)
+        events = None
+        if self.__result_cache is not None or self.__file_writer is not None:
+            self.__access = events = []
+        self.__denied = None
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = cursor.executemany(sql_code, params) if many else cursor.execute(sql_code, params)
+            failed = False
+            return result
+        except sqlite3.DatabaseError as error:
+            if self.__denied is not None:
+                raise sqlite3.NotSupportedError(self.__denied) from error
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.__access = None
+            if self.__denied is not None:
+                # Refused when prepared: nothing was run (and nothing to replicate).
+                events = None
+            if events is not None:
+                access = self.__statements[sql_code]
+                if events or access is None:
+                    # Prepared now: a new statement, or the first use since the authorizer was installed.
+                    access = _statement_access(events)
+                    self.__statements[sql_code] = access
+                # Also after an error: part of the rows could be written before it.
+                for table in access.written:
+                    self.__table_versions[table] = self.__table_versions.get(table, 0) + 1
+                if self.__file_writer is not None and access.replicate:
+                    self.__mirror_log.append((sql_code, params, many, failed))
+                    if any(action in (sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_ALTER_TABLE)
+                           for action, _, _ in events):
+                        self.__find_volatile_defaults()
+            if record and self.__query_stats is not None:
+                self.__record_query(sql_code, None if many else params, seconds, max(cursor.rowcount, 0))
+
+    def snapshot(self, path: str, pages: int = SNAPSHOT_PAGES, sleep_ms: float = SNAPSHOT_SLEEP_MS,
+                 progress=None) -> dict:
+        """
+        Copy the database to another file while it is in use (SQLite backup API): pages are copied in steps of
+        `pages` with a pause of sleep_ms between steps, so other connections can keep working. If they write
+        during the copy, SQLite starts it again, the snapshot is always consistent (a lock without writes only
+        delays the copy).
+        With a lot of writes the copy could never end: after SNAPSHOT_MAX_RESTARTS it is done in one step
+        (the database is locked for writers during that step, except in WAL mode).
+        The copy is made in path + '.tmp' and renamed at the end: path is never half written.
+        :param path: Snapshot file (replaced if it exists).
+        :param pages: Pages per step (-1: all in one step).
+        :param sleep_ms: Pause between steps.
+        :param progress: Function(copied_pages, total_pages) called after every step (optional).
+        :return: Dictionary with path, pages, mb, steps, restarts, seconds and mb_per_second.
+        """
+        assert not self.__transaction_depth, '+-- ERROR: Cannot take a snapshot inside a transaction.'
+        self.flush()
+        steps, restarts, copied = 0, 0, 0
+
+        def step(status, remaining, total):
+            nonlocal steps, restarts, copied
+            if status in SNAPSHOT_BUSY_STATUS:
+                # Another connection holds a lock (no data changed): sqlite3 already sleeps before the next try.
+                return
+            steps += 1
+            if status == sqlite3.SQLITE_OK and copied and total - remaining <= copied:
+                # Another connection wrote: SQLite started again from the first page (no progress since the
+                # last step, or less pages copied than before).
+                restarts += 1
+                if restarts > SNAPSHOT_MAX_RESTARTS and pages != -1:
+                    raise InterruptedError
+            copied = total - remaining
+            if progress is not None:
+                progress(copied, total)
+            if remaining and sleep_ms:
+                # sqlite3 only pauses when the database is locked: pause here to let the other connections work.
+                time.sleep(sleep_ms / 1000)
+
+        print(f'+-- Taking snapshot into "{path}".')
+        temporary = path + '.tmp'
+        start = time.perf_counter()
+        for step_pages in (pages, -1):
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            target = sqlite3.connect(temporary)
+            try:
+                self.__db.backup(target, pages=step_pages, progress=step)
+                page_size = target.execute('PRAGMA page_size').fetchone()[0]
+                total = target.execute('PRAGMA page_count').fetchone()[0]
+                break
+            except InterruptedError:
+                print(f'+- Copy restarted {restarts} times, copying in one step.')
+                pages, copied = -1, 0
+            finally:
+                target.close()
+        os.replace(temporary, path)
+        seconds = time.perf_counter() - start
+        report = {'path': path, 'pages': total, 'mb': total * page_size / 1024 / 1024, 'steps': steps,
+                  'restarts': restarts, 'seconds': seconds}
+        report['mb_per_second'] = report['mb'] / seconds if seconds else 0.0
+        print(f'+- Snapshot saved: {report["mb"]:,.1f} MB in {seconds:,.2f} s ({report["mb_per_second"]:,.1f} MB/s).\n')
+        return report
+
+    def rotate_snapshot(self, directory: str, keep: int = SNAPSHOT_KEEP, **snapshot_kwargs) -> dict:
+        """
+        Take a snapshot into directory (named after the database and the time) and delete the oldest ones,
+        so only the last `keep` snapshots remain.
+        :param directory: Folder of the snapshots (created if needed).
+        :param keep: Snapshots kept.
+        :param snapshot_kwargs: pages, sleep_ms, progress (see snapshot).
+        :return: Report of snapshot plus removed (list of deleted files).
+        """
+        assert keep > 0, '+-- ERROR: At least one snapshot must be kept.'
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.splitext(os.path.basename(self.__path_to_db))[0] or 'database'
+        # The time in the name sorts the snapshots from the oldest to the newest.
+        report = self.snapshot(os.path.join(directory, f'{name}-{datetime.now():%Y%m%d-%H%M%S-%f}.snapshot'),
+                               **snapshot_kwargs)
+        snapshots = sorted(file for file in os.listdir(directory)
+                           if file.startswith(f'{name}-') and file.endswith('.snapshot'))
+        report['removed'] = [os.path.join(directory, file) for file in snapshots[:-keep]]
+        for file in report['removed']:
+            os.remove(file)
+        return report
+
+    @classmethod
+    def restore_snapshot(cls, snapshot_path: str, path_to_db: str, **kwargs) -> 'DataBase':
+        """
+        Copy a snapshot into path_to_db (its content is replaced) and connect to it.
+        :param snapshot_path: Snapshot file (see snapshot and rotate_snapshot).
+        :param path_to_db: Database to create (':memory:' for a copy in memory).
+        :param kwargs: Other arguments for DataBase.
+        :return: New DataBase.
+        """
+        assert os.path.exists(snapshot_path), f'+-- ERROR: Snapshot "{snapshot_path}" not found.'
+        print(f'+-- Restoring snapshot "{snapshot_path}".')
+        database = cls(path_to_db, **kwargs)
+        source = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(database.connection)
+        finally:
+            source.close()
+        print('+- Snapshot restored.\n')
+        return database
+
+    def enable_memory_mirror(self, background: bool = False) -> dict:
+        """
+        Copy the database into memory (backup API) and serve everything from the copy: reads do not touch the
+        file any more. The writes are done in memory and, on every commit, in the file too:
+        - background=False: the commit returns when the file is committed.
+        - background=True: a thread writes them to the file (faster commits, the file is a bit behind: call
+          flush_mirror to wait for it). A crash loses what is not in the file yet.
+        Only this DataBase must write to the file while the mirror is in use.
+        The file gets the same SQL code, not the rows: writes using random() or date functions, and INSERTs in
+        tables with such a DEFAULT (i.e. CURRENT_TIMESTAMP, even if the INSERT gives the value), are refused
+        (sqlite3.NotSupportedError) while the mirror is in use, they would write other values in the file.
+        :param background: Write the file from a background thread.
+        :return: Dictionary with seconds (copy time), mb (memory used by the copy) and pages.
+        """
+        assert self.__path_to_db != ':memory:', '+-- ERROR: The database is already in memory.'
+        assert self.__file_writer is None, '+-- ERROR: The memory mirror is already enabled.'
+        assert not self.__transaction_depth, '+-- ERROR: Cannot enable the memory mirror inside a transaction.'
+        print('+-- Copying database into memory.')
+        self.flush()
+        self.__commit_now()
+        start = time.perf_counter()
+        memory = sqlite3.connect(':memory:', cached_statements=self.__statement_cache_size)
+        self.__db.backup(memory)
+        seconds = time.perf_counter() - start
+        page_size = memory.execute('PRAGMA page_size').fetchone()[0]
+        pages = memory.execute('PRAGMA page_count').fetchone()[0]
+
+        self.__db.close()
+        self.__db = memory
+        self.__cursor = memory.cursor()
+        # New connection: none of the statements is prepared in it.
+        self.__statements.clear()
+        self.__file_writer = FileWriter(self.__path_to_db, background)
+        self.__find_volatile_defaults()
+        self.__update_authorizer()
+        self.__mirror_report = {'seconds': seconds, 'mb': pages * page_size / 1024 / 1024, 'pages': pages}
+        print(f'+- Database copied in {seconds * 1000:,.1f} ms ({self.__mirror_report["mb"]:,.1f} MB in memory).\n')
+        return dict(self.__mirror_report)
+
+    def disable_memory_mirror(self) -> None:
+        """
+        Write the pending changes to the file and use the file again.
+        :return: None.
+        """
+        if self.__file_writer is None:
+            return
+        assert not self.__transaction_depth, '+-- ERROR: Cannot disable the memory mirror inside a transaction.'
+        self.flush()
+        self.__commit_now()
+        self.__file_writer.close()
+        self.__file_writer = None
+        self.__db.close()
+        self.__db = sqlite3.connect(self.__path_to_db, cached_statements=self.__statement_cache_size)
+        self.__cursor = self.__db.cursor()
+        self.__statements.clear()
+        self.__update_authorizer()
+
+    def flush_mirror(self) -> None:
+        """
+        Wait until all the committed writes are in the file (background memory mirror).
+        :return: None.
+        """
+        if self.__file_writer is not None:
+            self.__file_writer.flush()
+
+    def mirror_info(self) -> dict:
+        """
+        State of the memory mirror.
+        :return: Dictionary with enabled, background, seconds/mb/pages of the initial copy, mb (memory used now),
+         pending (transactions not yet in the file), transactions (written to the file) and errors.
+        """
+        if self.__file_writer is None:
+            return {'enabled': False}
+        page_size = self.__db.execute('PRAGMA page_size').fetchone()[0]
+        pages = self.__db.execute('PRAGMA page_count').fetchone()[0]
+        return {'enabled': True, 'background': self.__file_writer.background,
+                'initial_copy': dict(self.__mirror_report), 'mb': pages * page_size / 1024 / 1024,
+                'pending': self.__file_writer.pending(), 'transactions': self.__file_writer.transactions,
+                'errors': list(self.__file_writer.errors)}
+
+    def check_mirror(self) -> dict:
+        """
+        Compare the memory mirror with the file (after writing the pending changes): same tables, same
+        definitions and same rows. Reads all the data, use it when needed, not on every request.
+        :return: Dictionary with consistent (True/False) and, per table, rows in memory, rows in the file
+         and same (True/False).
+        """
+        assert self.__file_writer is not None, '+-- ERROR: The memory mirror is not enabled.'
+        self.__file_writer.flush()
+        file_db = self.__file_writer.connection
+        schema_sql = 'SELECT type, name, sql FROM sqlite_master ORDER BY type, name'
+        memory_schema = self.__db.execute(schema_sql).fetchall()
+        report = {'consistent': memory_schema == file_db.execute(schema_sql).fetchall(), 'tables': {}}
+        for kind, table, _ in memory_schema:
+            if kind != 'table' or table.startswith('sqlite_'):
+                continue
+            memory_rows, memory_digest = self.__table_digest(self.__db, table)
+            file_rows, file_digest = self.__table_digest(file_db, table)
+            same = memory_digest == file_digest
+            report['tables'][table] = {'rows_memory': memory_rows, 'rows_file': file_rows, 'same': same}
+            report['consistent'] = report['consistent'] and same
+        return report
+
+    @staticmethod
+    def __table_digest(connection: sqlite3.Connection, table_name: str) -> tuple:
+        """
+        Hash of all the rows of a table (sorted by all the columns, so the physical order does not matter).
+        :param connection: Connection to use.
+        :param table_name: Name of the table.
+        :return: Number of rows, BLAKE2 digest.
+        """
+        columns = len(connection.execute(f'PRAGMA table_info("{table_name}")').fetchall())
+        order = ', '.join(str(number) for number in range(1, columns + 1))
+        hasher = hashlib.blake2b()
+        rows = 0
+        cursor = connection.execute(f'SELECT * FROM "{table_name}" ORDER BY {order}')
+        while True:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            rows += len(batch)
+            hasher.update(repr(batch).encode('utf-8'))
+        return rows, hasher.hexdigest()
+
+    def __commit_now(self) -> None:
+        """
+        Commit the open transaction. With the memory mirror, its writes are sent to the file.
+        :return: None.
+        """
+        self.__db.commit()
+        if self.__file_writer is not None and self.__mirror_log:
+            statements, self.__mirror_log = self.__mirror_log, []
+            self.__file_writer.apply(statements)
+
+    def __rollback_now(self) -> None:
+        """
+        Roll back the open transaction. With the memory mirror, its writes are not sent to the file.
+        :return: None.
+        """
+        self.__db.rollback()
+        self.__mirror_log = []
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group any number of writes in one commit (one disk sync instead of one per write):
+            with db.transaction():
+                db.update_database(...)
+                db.insert_records(...)
+        If there is an error inside the block, all its writes are undone and the error is raised.
+        Nested blocks join the outermost one.
+        :return: The DataBase (context manager).
+        """
+        if not self.__transaction_depth:
+            self.flush()
+            if not self.__db.in_transaction:
+                # Explicit BEGIN: CREATE TABLE and other statements would not open a transaction by themselves.
+                self.__execute('BEGIN')
+        self.__transaction_depth += 1
+        try:
+            yield self
+        except Exception:
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                self.__rollback_now()
+                self.__clear_result_cache()
+                print('+- Transaction rolled back.\n')
+            raise
+        else:
+            self.__transaction_depth -= 1
+            if not self.__transaction_depth:
+                self.__commit_now()
+
+    def enable_group_commit(self, max_statements: int = 100, max_delay_ms: float = 50) -> None:
+        """
+        Buffer the writes and commit them together every max_statements writes or when the oldest pending
+        write is older than max_delay_ms. The delay is checked on every write and before every read
+        (gather_records, iter_records, fetch_columns, show_all_data, snapshot...). There is no timer (the connection
+        can only be used by its own thread): until the next call, the pending writes keep the write lock of the
+        database and other connections do not see them. Call flush (or end_connection) after the last write of a
+        burst. A failed write only undoes itself, the other pending writes are kept.
+        :param max_statements: Writes per commit.
+        :param max_delay_ms: Max time (ms) a write waits for its commit (checked on the next write or read).
+        :return: None.
+        """
+        self.__group_commit = (max_statements, max_delay_ms / 1000)
+
+    def disable_group_commit(self) -> None:
+        """
+        Commit the pending writes and go back to one commit per write.
+        :return: None.
+        """
+        self.flush()
+        self.__group_commit = None
+
+    def flush(self) -> None:
+        """
+        Commit the writes pending of the group commit (if any).
+        :return: None.
+        """
+        if self.__pending_writes and not self.__transaction_depth:
+            self.__commit_now()
+            self.__pending_writes = 0
+
+    def __flush_due(self) -> None:
+        """
+        Commit the pending writes of the group commit if the oldest one waited max_delay_ms (before a read).
+        :return: None.
+        """
+        if self.__pending_writes and time.perf_counter() - self.__first_pending >= self.__group_commit[1]:
+            self.flush()
+
+    def __commit(self) -> None:
+        """
+        Commit after a write: now, at the end of transaction() or when the group commit decides.
+        :return: None.
+        """
+        if self.__transaction_depth:
+            return
+        if self.__group_commit is None:
+            self.__commit_now()
+            return
+        max_statements, max_delay = self.__group_commit
+        if not self.__pending_writes:
+            self.__first_pending = time.perf_counter()
+        self.__pending_writes += 1
+        if self.__pending_writes >= max_statements or time.perf_counter() - self.__first_pending >= max_delay:
+            self.flush()
+
+    def __rollback(self, error: Exception) -> None:
+        """
+        Undo a failed write.
+        :param error: Error of the write. Raised again inside transaction() so the whole block is undone.
+        :return: None.
+        """
+        if self.__transaction_depth:
+            raise error
+        if self.__group_commit is None:
+            self.__rollback_now()
+            # Replies read during the transaction can include the undone writes.
+            self.__clear_result_cache()
+        # With group commit the savepoint of __write_scope already undid the failed write.
+
+    @contextmanager
+    def __write_scope(self):
+        """
+        Wrap one write. With group commit, the write gets a savepoint so an error only undoes this write
+        and not the other pending ones.
+        :return: None (context manager).
+        """
+        savepoint = self.__group_commit is not None and not self.__transaction_depth
+        if savepoint:
+            if not self.__db.in_transaction:
+                # Without an open transaction, RELEASE of the savepoint would commit.
+                self.__execute('BEGIN')
+            self.__execute('SAVEPOINT group_write')
+        try:
+            yield
+        except Exception:
+            if savepoint:
+                self.__execute('ROLLBACK TO group_write')
+                self.__execute('RELEASE group_write')
+            raise
+        else:
+            if savepoint:
+                self.__execute('RELEASE group_write')
+
     def end_connection(self) -> None:
         """
         Close the connection to the database.
         :return: None.
         """
         print('+- Closing database connection.')
+        self.flush()
+        if self.__file_writer is not None:
+            self.__commit_now()
+            self.__file_writer.close()
         self.__db.close()
 
 
@@ -197,12 +1382,13 @@ if __name__ == '__main__':
 
     # Select all records with a grade between 60 and 80 =================
     # Generate the SQL code to be used.
+    # Placeholders (?) for the values: the statement is prepared once and the values are never part of the code.
     sql_command = f'''
         SELECT *
         FROM {db_table}
-        WHERE grade BETWEEN 60 AND 80
+        WHERE grade BETWEEN ? AND ?
     '''
-    reply_from_db = db.gather_records(sql_command)
+    reply_from_db = db.gather_records(sql_command, (60, 80))
 
     # Using tabulate to pretty print.
     print('+-- Records with a grade between 60 and 80: =================+')
@@ -214,10 +1400,10 @@ if __name__ == '__main__':
     # Generate the SQL code to be used.
     sql_command = f'''
         UPDATE {db_table}
-        SET grade = 65
-        WHERE name = "Carl Davis"
+        SET grade = ?
+        WHERE name = ?
     '''
-    db.update_database(sql_command)
+    db.update_database(sql_command, (65, 'Carl Davis'))
 
     # Print status of db after changing the db.
     db.show_all_data(db_table)
@@ -227,9 +1413,9 @@ if __name__ == '__main__':
     # Generate the SQL code to be used.
     sql_command = f'''
             DELETE FROM {db_table}
-            WHERE name = "Dennis Fredrickson"
+            WHERE name = ?
         '''
-    db.update_database(sql_command)
+    db.update_database(sql_command, ('Dennis Fredrickson',))
 
     # Print status of db after changing the db.
     db.show_all_data(db_table)
@@ -239,11 +1425,11 @@ if __name__ == '__main__':
     # Generate the SQL code to be used.
     sql_command = f'''
                 UPDATE {db_table}
-                SET grade = 33
-                WHERE id < 55
+                SET grade = ?
+                WHERE id < ?
             '''
     # Note: Instructions say below 55, therefore, Carl Davis's grade (ID = 55) must not be changed.
-    db.update_database(sql_command)
+    db.update_database(sql_command, (33, 55))
 
     # Print status of db after changing the db.
     db.show_all_data(db_table)
@@ -0,0 +1,115 @@
+"""
+    Description:
+        Test of DataBase.snapshot while another connection keeps writing.
+        Run: python -m unittest test_snapshot (from this folder).
+    :copyright: (c) 2023 Juan Carcedo, All rights reserved
+    :licence: MIT, see LICENSE.txt for further details.
+"""
+# IMPORT ===============
+import contextlib
+import faulthandler
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from main import SNAPSHOT_MAX_RESTARTS, DataBase
+
+# CONSTANTS ===============
+ROWS = 40_000
+# Seconds before a snapshot that never ends stops the test run.
+TIMEOUT = 60
+
+
+class SnapshotWithWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'student_db')
+        connection = sqlite3.connect(self.path)
+        connection.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)')
+        connection.executemany('INSERT INTO t (v) VALUES (?)', [('x' * 200,) for _ in range(ROWS)])
+        connection.commit()
+        connection.close()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_snapshot_ends_with_concurrent_writer(self):
+        stop = threading.Event()
+
+        def writer():
+            connection = sqlite3.connect(self.path, timeout=30)
+            while not stop.is_set():
+                connection.execute('INSERT INTO t (v) VALUES (?)', ('y',))
+                connection.commit()
+                time.sleep(0.001)
+            connection.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DataBase(self.path)
+        snapshot_path = os.path.join(self.folder.name, 'student_db.snapshot')
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        writer_thread.start()
+        # A copy that never ends stops the test run (with the traceback) instead of hanging it.
+        faulthandler.dump_traceback_later(TIMEOUT, exit=True)
+        try:
+            # Let the writer start before the copy.
+            time.sleep(0.05)
+            with contextlib.redirect_stdout(io.StringIO()):
+                reply = db.snapshot(snapshot_path, pages=500, sleep_ms=1)
+                db.end_connection()
+        finally:
+            faulthandler.cancel_dump_traceback_later()
+            stop.set()
+            writer_thread.join()
+
+        # The writer commits every millisecond: the copy is restarted and ends in one step.
+        self.assertGreater(reply['restarts'], SNAPSHOT_MAX_RESTARTS)
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            self.assertEqual(snapshot.execute('PRAGMA integrity_check').fetchone()[0], 'ok')
+            self.assertGreaterEqual(snapshot.execute('SELECT count(*) FROM t').fetchone()[0], ROWS)
+        finally:
+            snapshot.close()
+
+    def test_lock_without_writes_is_not_a_restart(self):
+        locked, done = threading.Event(), threading.Event()
+
+        def locker():
+            # Holds the lock for a few steps of the copy and changes nothing.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('BEGIN EXCLUSIVE')
+            locked.set()
+            time.sleep(1)
+            connection.execute('ROLLBACK')
+            connection.close()
+            done.set()
+
+        def progress(copied, total):
+            if not locked.is_set():
+                threading.Thread(target=locker, daemon=True).start()
+                locked.wait(30)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DataBase(self.path)
+        # No busy timeout: the steps during the lock return SQLITE_BUSY instead of waiting inside SQLite.
+        db.connection.execute('PRAGMA busy_timeout = 0')
+        faulthandler.dump_traceback_later(TIMEOUT, exit=True)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                reply = db.snapshot(os.path.join(self.folder.name, 'student_db.snapshot'), pages=100, sleep_ms=1,
+                                    progress=progress)
+                db.end_connection()
+        finally:
+            faulthandler.cancel_dump_traceback_later()
+        self.assertTrue(done.is_set())
+        self.assertEqual(reply['restarts'], 0)
+        self.assertGreater(reply['steps'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()